@@ -0,0 +1,70 @@
+# scrape_worker.py
+
+import threading
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from scraper.browser_pool import shutdown_browser_pool
+from scraper.config import scraper_setting
+from scraper.scrape_jobs import claim_next_job, default_worker_id, reclaim_stale_jobs, run_claimed_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a scrape worker: claim queued ScrapeJobs from the database and run them. "
+        "Start as many as needed (set SCRAPER_JOB_BACKEND = \"queue\" so the web process only enqueues)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None,
+                            help="Jobs run at once by this process (default: SCRAPER_JOB_WORKERS).")
+        parser.add_argument("--poll-interval", type=float, default=None,
+                            help="Seconds to wait when the queue is empty (default: SCRAPER_JOB_POLL_SECONDS).")
+        parser.add_argument("--worker-id", default=None,
+                            help="Name recorded on claimed jobs (default: host:pid).")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue is empty instead of polling forever.")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"] or scraper_setting("SCRAPER_JOB_WORKERS", 2))
+        poll_interval = options["poll_interval"] or scraper_setting("SCRAPER_JOB_POLL_SECONDS", 2)
+        worker_id = options["worker_id"] or default_worker_id()
+        once = options["once"]
+        stop = threading.Event()
+
+        def work(slot):
+            slot_id = f"{worker_id}:{slot}"
+            while not stop.is_set():
+                try:
+                    close_old_connections()
+                    reclaim_stale_jobs()
+                    job_id = claim_next_job(slot_id)
+                    if job_id is None:
+                        if once:
+                            return
+                        stop.wait(poll_interval)
+                        continue
+                    run_claimed_job(job_id, slot_id)
+                except Exception as e:
+                    print(f"❌ Worker {slot_id} error: {e}")
+                    stop.wait(poll_interval)
+            close_old_connections()
+
+        self.stdout.write(f"🚀 Scrape worker {worker_id} started ({concurrency} slot(s), polling every {poll_interval}s).")
+        threads = [
+            threading.Thread(target=work, args=(slot,), name=f"scrape-worker-{slot}", daemon=True)
+            for slot in range(1, concurrency + 1)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write("⏹️ Stopping: finishing running jobs (Ctrl+C again to abort)...")
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            shutdown_browser_pool()
+        self.stdout.write(f"✅ Scrape worker {worker_id} stopped.")
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_pricehistory_product_title_snapshot_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackedproduct',
+            name='asin',
+            field=models.CharField(blank=True, db_index=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='trackedproduct',
+            name='product_url',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+    ]
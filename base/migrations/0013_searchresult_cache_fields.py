@@ -0,0 +1,67 @@
+# Generated by Django 5.1 on 2026-10-17 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0012_scrapejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchresult',
+            name='asin',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='availability',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='depth',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='normalized_query',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='rating',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='reviews',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='searchresult',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='searchresult',
+            name='product_url',
+            field=models.URLField(max_length=1000),
+        ),
+        migrations.AlterField(
+            model_name='searchresult',
+            name='query',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='searchresult',
+            index=models.Index(fields=['normalized_query', 'depth', 'created_at'], name='searchresult_query_time_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1 on 2026-10-17 20:23
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_searchresult_cache_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapejob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scrapejob',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapejob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapejob',
+            name='kind',
+            field=models.CharField(choices=[('search', 'Search'), ('refresh', 'Refresh tracked products')], default='search', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='scrapejob',
+            name='payload',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+        migrations.AlterField(
+            model_name='scrapejob',
+            name='query',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='scrapejob',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scrape_jobs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='scrapejob',
+            index=models.Index(fields=['status', 'created_at'], name='scrapejob_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-17 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0014_scrapejob_queue_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackedproduct',
+            name='next_scrape_due',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trackedproduct',
+            name='price_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trackedproduct',
+            name='price_volatility',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.utils import timezone
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 from datetime import timedelta, time
 from decimal import Decimal, InvalidOperation
@@ -13,12 +14,25 @@ def current_time_gmt2():
 
 
 class SearchResult(models.Model):
-    query = models.CharField(max_length=100)
+    query = models.CharField(max_length=255)
+    # Filled by the scrapers: one row per product of a search, all rows of one search share created_at
+    normalized_query = models.CharField(max_length=255, null=True, blank=True)
+    depth = models.PositiveSmallIntegerField(null=True, blank=True)
+    position = models.PositiveIntegerField(default=0)
+    asin = models.CharField(max_length=10, null=True, blank=True)
     product_name = models.CharField(max_length=255)
-    product_url = models.URLField()
-    price = models.DecimalField(max_digits=10, decimal_places=2)
+    product_url = models.URLField(max_length=1000)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    rating = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
+    reviews = models.IntegerField(null=True, blank=True)
+    availability = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(default=current_time_gmt2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['normalized_query', 'depth', 'created_at'], name='searchresult_query_time_idx'),
+        ]
+
     def __str__(self):
         return self.product_name
 
@@ -42,6 +56,13 @@ class TrackedProduct(models.Model):
     availability = models.CharField(max_length=100, null=True, blank=True, default="Unknown")
     date_scraped = models.DateTimeField(default=current_time_gmt2)
     target_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Captured when the product is first tracked, so re-scrapes can load /dp/<ASIN> directly
+    asin = models.CharField(max_length=10, null=True, blank=True, db_index=True)
+    product_url = models.URLField(max_length=500, null=True, blank=True)
+    # Adaptive scheduling, updated on every new PriceHistory row (scheduled_tasks/scrape_frequency.py)
+    price_volatility = models.FloatField(default=0.0)
+    price_changed_at = models.DateTimeField(null=True, blank=True)
+    next_scrape_due = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return (
@@ -120,6 +141,61 @@ class Watchlist(models.Model):
         return f"{self.name} (Owner: {self.user.username})"
 
 
+class ScrapeJob(models.Model):
+    """
+    A scrape waiting for or running on a worker: a manual /search/ ("search") or a price
+    re-check of tracked products ("refresh"). Polled by the frontend, claimed by workers.
+    """
+    KIND_SEARCH = "search"
+    KIND_REFRESH = "refresh"
+    KIND_CHOICES = [
+        (KIND_SEARCH, "Search"),
+        (KIND_REFRESH, "Refresh tracked products"),
+    ]
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_SEARCH)
+    # Null for system jobs (the scheduler's refresh runs)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='scrape_jobs')
+    query = models.CharField(max_length=255, blank=True, default="")
+    depth = models.PositiveSmallIntegerField(default=3)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    availability_mode = models.CharField(max_length=20, null=True, blank=True)
+    # Kind-specific arguments, e.g. {"product_ids": [...], "event_name": ...} for refresh jobs
+    payload = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    # Claiming: which worker holds the job, when it last reported in, and how many times it was claimed
+    claimed_by = models.CharField(max_length=100, null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Progress, updated while the scrape runs
+    pages_done = models.PositiveIntegerField(default=0)
+    products_found = models.PositiveIntegerField(default=0)
+    results = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='scrapejob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        owner = self.user.username if self.user else "system"
+        return f"{self.kind} '{self.query}' for {owner} — {self.status}"
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='userprofile')
     scheduled_scraping_enabled = models.BooleanField(default=True)
@@ -135,3 +211,25 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
     else:
         instance.userprofile.save()
+
+
+# Recompute the product's adaptive re-scrape time whenever a price point is recorded
+@receiver(post_save, sender=PriceHistory)
+def update_next_scrape_due(sender, instance, created, **kwargs):
+    if not created or instance.product_id is None:
+        return
+    from scheduled_tasks.scrape_frequency import apply_price_point
+
+    product = instance.product
+    previous_price = (
+        PriceHistory.objects
+        .filter(product_id=instance.product_id)
+        .exclude(pk=instance.pk)
+        .order_by('-date_recorded')
+        .values_list('price_numeric', flat=True)
+        .first()
+    )
+    if previous_price is None:
+        previous_price = product.price
+    update_fields = apply_price_point(product, previous_price, instance.price_numeric, instance.date_recorded)
+    product.save(update_fields=update_fields)
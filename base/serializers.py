@@ -5,7 +5,10 @@ from .models import Product, SearchResult, Watchlist, TrackedProduct, PriceHisto
 class SearchResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = SearchResult
-        fields = ['product_name', 'product_url', 'price', 'query', 'created_at']
+        fields = [
+            'product_name', 'product_url', 'price', 'query', 'created_at',
+            'normalized_query', 'depth', 'position', 'asin', 'rating', 'reviews', 'availability',
+        ]
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -23,7 +26,7 @@ class TrackedProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = TrackedProduct
         fields = ['id', 'user', 'title', 'price', 'target_price', 'rating', 'reviews',
-            'availability', 'date_scraped'
+            'availability', 'date_scraped', 'asin', 'product_url'
         ]
         extra_kwargs = {
             'price': {'max_digits': 10, 'decimal_places': 2},
@@ -37,7 +40,7 @@ class SimpleTrackedProductSerializer(serializers.ModelSerializer):
         model = TrackedProduct
         fields = [
             'id', 'title', 'price', 'target_price', 'rating', 'reviews',
-            'availability', 'date_scraped'
+            'availability', 'date_scraped', 'asin', 'product_url'
         ]
 
 
@@ -1,3 +1,155 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import OperationalError
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from base.models import PriceHistory, ScrapeJob, TrackedProduct, Watchlist, current_time_gmt2
+from scraper.result_store import InMemoryResultStore
+from scraper.scrape_jobs import Heartbeat, resume_orphaned_jobs, run_scrape_job
 
-# Create your tests here.
+
+def search_card(asin, price, availability="Unknown"):
+    return {
+        "asin": asin,
+        "title": f"Product {asin}",
+        "price": price,
+        "rating": 4.5,
+        "reviews": 120,
+        "link": f"https://www.amazon.com/dp/{asin}",
+        "availability": availability,
+    }
+
+
+class ScrapedResultsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.store = InMemoryResultStore(ttl_seconds=60, max_entries=10)
+        store_patch = mock.patch("base.views.product_views.get_result_store", return_value=self.store)
+        store_patch.start()
+        self.addCleanup(store_patch.stop)
+
+    def store_results(self, results, availability_mode="deferred"):
+        self.store.set(self.user.id, {"results": results, "availability_mode": availability_mode})
+
+
+class GetScrapedResultsTests(ScrapedResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store_results([search_card("B0TEST0001", Decimal("1.50")), search_card("B0TEST0002", Decimal("2.00"))])
+
+    def test_index_outside_the_results_is_rejected(self):
+        for index in ("-1", "2", "abc", ""):
+            with self.subTest(index=index):
+                response = self.client.get("/get-scraped-results/", {"index": index})
+                self.assertEqual(response.status_code, 400)
+
+    @mock.patch("base.views.product_views.fetch_availability", new_callable=mock.AsyncMock, return_value="In Stock")
+    def test_deferred_availability_is_looked_up_and_kept(self, fetch_availability):
+        response = self.client.get("/get-scraped-results/", {"index": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["asin"], "B0TEST0002")
+        self.assertEqual(response.json()["availability"], "In Stock")
+        self.assertEqual(self.store.get(self.user.id)["results"][1]["availability"], "In Stock")
+
+    @mock.patch("base.views.product_views.fetch_availability", new_callable=mock.AsyncMock, side_effect=RuntimeError("no browser"))
+    def test_failed_availability_lookup_still_returns_the_product(self, fetch_availability):
+        response = self.client.get("/get-scraped-results/", {"index": "0"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["asin"], "B0TEST0001")
+        self.assertEqual(response.json()["availability"], "Unknown")
+
+
+class JobResultsTests(ScrapedResultsTestCase):
+    def run_search_job(self, results):
+        job = ScrapeJob.objects.create(kind=ScrapeJob.KIND_SEARCH, user=self.user, query="usb c cable", availability_mode="skip")
+        with mock.patch("scraper.scrape_jobs.scrape_amazon", new_callable=mock.AsyncMock, return_value=results):
+            run_scrape_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScrapeJob.STATUS_DONE)
+        return job
+
+    def test_job_and_result_store_return_identical_records(self):
+        results = [search_card("B0TEST0001", Decimal("1.50"), "In Stock"), search_card("B0TEST0002", None, "In Stock")]
+        self.store_results(results, availability_mode="skip")
+        job = self.run_search_job(results)
+
+        from_store = self.client.get("/get-scraped-results/").json()
+        from_job = self.client.get("/get-scraped-results/", {"job_id": job.id}).json()
+        self.assertEqual(from_job, from_store)
+        self.assertEqual(from_job[0]["price"], 1.5)
+
+        for index in ("0", "1"):
+            with self.subTest(index=index):
+                self.assertEqual(
+                    self.client.get("/get-scraped-results/", {"job_id": job.id, "index": index}).json(),
+                    self.client.get("/get-scraped-results/", {"index": index}).json(),
+                )
+
+
+class ScrapeJobRecoveryTests(TestCase):
+    def test_heartbeat_keeps_beating_after_a_failed_beat(self):
+        beats = []
+
+        def flaky_filter(**kwargs):
+            beats.append(kwargs)
+            if len(beats) == 1:
+                raise OperationalError("database is locked")
+            return mock.Mock()
+
+        with mock.patch.object(ScrapeJob.objects, "filter", side_effect=flaky_filter):
+            with Heartbeat(1, "worker-1", interval=0.01):
+                deadline = time.monotonic() + 5
+                while len(beats) < 3 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+        self.assertGreaterEqual(len(beats), 3)
+
+    def test_orphaned_jobs_are_resumed_in_thread_mode(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        running = ScrapeJob.objects.create(status=ScrapeJob.STATUS_RUNNING, claimed_by="old-process", heartbeat_at=long_ago, attempts=1, created_at=long_ago)
+        queued = ScrapeJob.objects.create(created_at=long_ago)
+        fresh = ScrapeJob.objects.create()
+
+        executor = mock.Mock()
+        with mock.patch("scraper.scrape_jobs.get_job_executor", return_value=executor), mock.patch("scraper.scrape_jobs.close_old_connections"):
+            resume_orphaned_jobs()
+
+        running.refresh_from_db()
+        self.assertEqual(running.status, ScrapeJob.STATUS_QUEUED)
+        submitted = [call.args[1] for call in executor.submit.call_args_list]
+        self.assertEqual(submitted, [running.id, queued.id])
+        self.assertNotIn(fresh.id, submitted)
+
+
+class RunScrapingDefaultPlanTests(TestCase):
+    def test_default_run_scrapes_only_due_products_of_enabled_watchlists(self):
+        from scheduled_tasks import actions
+        from scheduled_tasks.due_queue import DailyPageBudget
+
+        user = User.objects.create_user(username="tracker", password="secret")
+        due = TrackedProduct.objects.create(user=user, title="USB C cable")
+        not_due = TrackedProduct.objects.create(user=user, title="HDMI cable")
+        PriceHistory.objects.create(product=not_due, price=Decimal("9.99"), price_numeric=Decimal("9.99"))
+        TrackedProduct.objects.filter(id=not_due.id).update(next_scrape_due=current_time_gmt2() + timedelta(days=3))
+        disabled = TrackedProduct.objects.create(user=user, title="Laptop stand")
+        Watchlist.objects.create(user=user, name="Cables").products.add(due, not_due)
+        Watchlist.objects.create(user=user, name="Paused", scheduled_scraping_enabled=False).products.add(disabled)
+
+        scraped = []
+
+        async def scrape_product_group(group, *args):
+            scraped.extend(product.id for product in group)
+            return [actions.OUTCOME_SAVED] * len(group)
+
+        with mock.patch.object(actions, "scrape_product_group", side_effect=scrape_product_group), \
+                mock.patch.object(actions, "daily_page_budget", DailyPageBudget()):
+            async_to_sync(actions.run_scraping)()
+
+        self.assertEqual(scraped, [due.id])
@@ -8,7 +8,7 @@ from base.views.auth_views import (
     register, custom_login, user_logout, get_user_info, get_scraping_setting, backfill_userprofiles, toggle_scraping_setting
 )
 from base.views.product_views import (
-    search_product, add_tracked_product, get_tracked_products, set_target_price, ProductViewSet, get_scraped_results, delete_tracked_product
+    search_product, stream_search_product, get_scrape_job_status, add_tracked_product, get_tracked_products, set_target_price, ProductViewSet, get_scraped_results, delete_tracked_product
 )
 from base.views.watchlist_views import (
     create_watchlist, get_user_watchlists, add_products_to_watchlist,
@@ -37,6 +37,8 @@ urlpatterns = [
     path('backfill-userprofiles/', backfill_userprofiles, name='backfill-userprofiles'),
 
     path('search/', search_product, name='search'),
+    path('search/stream/', stream_search_product, name='search-stream'),
+    path('scrape-jobs/<int:job_id>/', get_scrape_job_status, name='scrape-job-status'),
     path('add-tracked-product/', add_tracked_product, name='add-tracked-product'),
     path('get-tracked-products/', get_tracked_products, name='get-tracked-products'),
     path('set-target-price/', set_target_price, name='set-target-price'),
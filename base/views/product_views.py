@@ -4,13 +4,22 @@ from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal, InvalidOperation
 from asgiref.sync import async_to_sync
 from base.serializers import ProductSerializer
-from base.models import Product, TrackedProduct
-from scraper.playwright_scraper import scrape_amazon, TEMP_SCRAPE_RESULTS
+from base.models import Product, TrackedProduct, ScrapeJob
+from scraper.amazon_urls import build_product_url, extract_asin, is_valid_asin
+from scraper.config import scraper_setting
+from scraper.browser_pool import iterate_in_pool
+from scraper.playwright_scraper import fetch_availability, stream_scrape_amazon
+from scraper.result_store import get_result_store
+from scraper.search_cache import load_cached_search
+from scraper.scrape_jobs import submit_scrape_job
 
 
 
@@ -39,20 +48,143 @@ def search_product(request):
         return Response({"error": "Depth must be an integer."}, status=400)
 
     user = request.user
-    user_id = user.id
+    refresh = request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes')
 
     try:
-        # ✅ Pass depth to the scraper
-        async_to_sync(scrape_amazon)(query, user_id, depth)
+        # ✅ Answer from a recent identical search unless the caller asked for fresh results
+        if not refresh:
+            cached_results, cached_at = load_cached_search(query, depth)
+            if cached_results is not None:
+                now = timezone.now()
+                # The cached rows may come from a search that skipped or deferred availability:
+                # look any 'Unknown' one up when the user picks it, whatever the current mode is
+                availability_mode = scraper_setting("SCRAPER_AVAILABILITY_MODE", "concurrent")
+                if any(product.get("availability") == "Unknown" for product in cached_results):
+                    availability_mode = "deferred"
+                job = ScrapeJob.objects.create(
+                    user=user,
+                    query=query,
+                    depth=depth,
+                    status=ScrapeJob.STATUS_DONE,
+                    availability_mode=availability_mode,
+                    pages_done=depth,
+                    products_found=len(cached_results),
+                    results=cached_results,
+                    started_at=now,
+                    finished_at=now,
+                )
+                get_result_store().set(user.id, {
+                    "results": cached_results,
+                    "timestamp": now,
+                    "availability_mode": job.availability_mode,
+                })
+                return Response({
+                    "message": f"Search for '{query}' answered from results scraped at {cached_at}",
+                    "job_id": job.id,
+                    "status": job.status,
+                    "cached": True,
+                    "cached_at": cached_at,
+                }, status=200)
+
+        # ✅ Queue the scrape and return right away; poll /scrape-jobs/<job_id>/ for progress
+        job = ScrapeJob.objects.create(
+            user=user,
+            query=query,
+            depth=depth,
+            availability_mode=scraper_setting("SCRAPER_AVAILABILITY_MODE", "concurrent"),
+        )
+        submit_scrape_job(job)
 
         return Response({
-            "message": f"Search for '{query}' completed successfully"
-        }, status=200)
+            "message": f"Search for '{query}' started",
+            "job_id": job.id,
+            "status": job.status,
+            "cached": False,
+        }, status=202)
     except Exception as e:
-        print(f"Error during scraping: {e}")
+        print(f"Error queuing scrape job: {e}")
         return Response({"error": f"An error occurred: {str(e)}"}, status=500)
 
 
+def format_stream_event(stream_format, event, payload):
+    """Encode one streamed event as an SSE message or an NDJSON line."""
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {data}\n\n"
+    return json.dumps({"event": event, **payload}, cls=DjangoJSONEncoder) + "\n"
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stream_search_product(request):
+    """
+    Stream search results live while the scrape runs.
+    ?stream_format=sse (default) sends Server-Sent Events; ?stream_format=ndjson sends one JSON object per line.
+    Events: "product" ({index, product}) as each product is ready, then "done" ({count}) or "error" ({error}).
+    The streamed products are also kept for /get-scraped-results/?index=N.
+    """
+    query = request.query_params.get('query')
+    if not query:
+        return Response({"error": "Query parameter is required."}, status=400)
+
+    try:
+        depth = int(request.query_params.get('depth', 3))
+        if depth < 1 or depth > 10:
+            return Response({"error": "Depth must be between 1 and 10."}, status=400)
+    except ValueError:
+        return Response({"error": "Depth must be an integer."}, status=400)
+
+    stream_format = request.query_params.get('stream_format', 'sse')
+    if stream_format not in ("sse", "ndjson"):
+        return Response({"error": "stream_format must be 'sse' or 'ndjson'."}, status=400)
+
+    user_id = request.user.id
+
+    def events():
+        count = 0
+        try:
+            for product in iterate_in_pool(stream_scrape_amazon(query, user_id, depth)):
+                yield format_stream_event(stream_format, "product", {"index": count, "product": product})
+                count += 1
+            yield format_stream_event(stream_format, "done", {"count": count})
+        except Exception as e:
+            print(f"Error during streamed scraping: {e}")
+            yield format_stream_event(stream_format, "error", {"error": str(e)})
+
+    content_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    response = StreamingHttpResponse(events(), content_type=content_type)
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Don't let a proxy buffer the stream
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_scrape_job_status(request, job_id):
+    """
+    Report the status and progress of one of the user's scrape jobs.
+    """
+    try:
+        job = ScrapeJob.objects.get(id=job_id, user=request.user)
+    except ScrapeJob.DoesNotExist:
+        return Response({"error": "Scrape job not found."}, status=404)
+
+    return Response({
+        "job_id": job.id,
+        "kind": job.kind,
+        "query": job.query,
+        "depth": job.depth,
+        "status": job.status,
+        "attempts": job.attempts,
+        "pages_done": job.pages_done,
+        "products_found": job.products_found,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }, status=200)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_tracked_product(request):
@@ -72,6 +204,11 @@ def add_tracked_product(request):
             except InvalidOperation:
                 return Response({"error": "Invalid target_price format. Use a numeric value."}, status=400)
 
+        # ✅ A client-supplied ASIN becomes a /dp/<ASIN> URL for scheduled re-scrapes, so it must be one
+        asin_input = request.data.get('asin')
+        if asin_input and not is_valid_asin(asin_input):
+            return Response({"error": "Invalid asin. Use the 10-character Amazon product ID."}, status=400)
+
         # Check if the product is already being tracked
         existing_product = TrackedProduct.objects.filter(title=product_name, user=user).first()
         if existing_product:
@@ -80,6 +217,10 @@ def add_tracked_product(request):
         # Adjust the current time to GMT+2
         current_time_gmt2 = (timezone.now() + timedelta(hours=2)).replace(microsecond=0)
 
+        # ✅ Capture the ASIN from the scraped link so re-scrapes can load /dp/<ASIN> directly
+        product_link = request.data.get('link')
+        asin = asin_input or extract_asin(product_link)
+
         # Create the new tracked product
         new_product = TrackedProduct.objects.create(
             user=user,
@@ -89,7 +230,9 @@ def add_tracked_product(request):
             rating=request.data.get('rating'),
             reviews=request.data.get('reviews'),
             availability=request.data.get('availability'),
-            date_scraped=current_time_gmt2
+            date_scraped=current_time_gmt2,
+            asin=asin,
+            product_url=build_product_url(asin) if asin else product_link,
         )
 
         return Response({
@@ -124,6 +267,8 @@ def get_tracked_products(request):
                 "reviews": product.reviews,
                 "availability": product.availability,
                 "date_scraped": product.date_scraped,
+                "asin": product.asin,
+                "product_url": product.product_url,
             }
             for product in tracked_products
         ]
@@ -168,27 +313,101 @@ def set_target_price(request):
     except Exception as e:
         print(f"Error updating target price: {e}")
         return Response({"error": "An unexpected error occurred."}, status=500)
-    
+
+
+def parse_result_index(index, count):
+    """The ?index= query parameter as a position in a list of `count` results, or None if it isn't one."""
+    try:
+        position = int(index)
+    except (TypeError, ValueError):
+        return None
+    return position if 0 <= position < count else None
+
+
+def resolve_availability(product_link):
+    """Deferred availability lookup for one product; 'Unknown' (left for a later try) if the browser fails."""
+    try:
+        return async_to_sync(fetch_availability)(product_link)
+    except Exception as e:
+        print(f"⚠️ Availability lookup failed for {product_link}: {e}")
+        return "Unknown"
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_scraped_results(request):
     """
     Return temporarily stored scraped products for the logged-in user.
-    These are stored in TEMP_SCRAPE_RESULTS during manual scraping.
+    These are kept in the result store (SCRAPER_RESULT_STORE) during manual scraping,
+    which expires them after SCRAPER_RESULT_TTL_MINUTES.
+    With ?job_id=N, returns that scrape job's results instead (409 while it is still running).
+    With ?index=N, returns only that product, resolving its availability first
+    if the search ran with deferred availability lookups.
     """
     user = request.user
-    entry = TEMP_SCRAPE_RESULTS.get(user.id)
+    job_id = request.query_params.get('job_id')
+    if job_id is not None:
+        return get_job_results(request, job_id)
+
+    store = get_result_store()
+    entry = store.get(user.id)
 
     if not entry:
         return Response([], status=200)
 
-    # Check expiration (10-minute window)
-    created_at = entry.get("timestamp")
-    if not created_at or (timezone.now() - created_at > timedelta(minutes=30)):
-        TEMP_SCRAPE_RESULTS.pop(user.id, None)
-        return Response([], status=200)
+    results = entry.get("results", [])
+    index = request.query_params.get('index')
+    if index is None:
+        return Response(results, status=200)
+
+    position = parse_result_index(index, len(results))
+    if position is None:
+        return Response({"error": "Invalid product index."}, status=400)
+    product = results[position]
 
-    return Response(entry.get("results", []), status=200)
+    # ✅ Deferred availability: look it up only for the product the user selected
+    if entry.get("availability_mode") == "deferred" and product.get("availability") == "Unknown" and product.get("link"):
+        product["availability"] = resolve_availability(product["link"])
+        if product["availability"] != "Unknown":
+            store.set(user.id, entry)
+
+    return Response(product, status=200)
+
+
+def get_job_results(request, job_id):
+    """get_scraped_results for ?job_id=N: the finished job's products (or one with ?index=N)."""
+    try:
+        job = ScrapeJob.objects.get(id=int(job_id), user=request.user)
+    except (ValueError, ScrapeJob.DoesNotExist):
+        return Response({"error": "Scrape job not found."}, status=404)
+
+    if job.status == ScrapeJob.STATUS_FAILED:
+        return Response({"error": f"Scrape job failed: {job.error}", "status": job.status}, status=500)
+    if job.status != ScrapeJob.STATUS_DONE:
+        return Response({
+            "message": "Scrape job is still running.",
+            "status": job.status,
+            "pages_done": job.pages_done,
+            "products_found": job.products_found,
+        }, status=409)
+
+    results = job.results or []
+    index = request.query_params.get('index')
+    if index is None:
+        return Response(results, status=200)
+
+    position = parse_result_index(index, len(results))
+    if position is None:
+        return Response({"error": "Invalid product index."}, status=400)
+    product = results[position]
+
+    # ✅ Deferred availability: look it up once and keep it on the job
+    if job.availability_mode == "deferred" and product.get("availability") == "Unknown" and product.get("link"):
+        product["availability"] = resolve_availability(product["link"])
+        if product["availability"] != "Unknown":
+            job.save(update_fields=["results"])
+
+    return Response(product, status=200)
 
 
 @api_view(['DELETE'])
@@ -3,6 +3,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from base.models import TrackedProduct, PriceHistory
 from scheduled_tasks.actions import run_scraping
+from scraper.config import scraper_setting
+from scraper.scrape_jobs import enqueue_refresh_job
 from asgiref.sync import async_to_sync
 from django.conf import settings  # ✅ Import settings for DEFAULT_FROM_EMAIL
 
@@ -18,6 +20,15 @@ def scrape_single_product(request, product_id):
         product = TrackedProduct.objects.get(id=product_id, user=request.user)
         print(f"🔁 Manually triggering scrape for: {product.title}")
 
+        if scraper_setting("SCRAPER_JOB_BACKEND", "thread") == "queue":
+            # ✅ A scrape worker runs it; poll /scrape-jobs/<job_id>/ for completion
+            job = enqueue_refresh_job([product], user=request.user)
+            return Response({
+                "message": f"Scrape for '{product.title}' queued",
+                "job_id": job.id,
+                "status": job.status,
+            }, status=202)
+
         # Get previous price history count to detect new entry later
         before_count = PriceHistory.objects.filter(product=product).count()
 
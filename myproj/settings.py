@@ -123,9 +123,27 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Scrape workers and the web process write concurrently; wait for locks instead of failing
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Manual search results waiting for selection, shared by all worker processes
+    'scrape_results': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'scrape_results_cache',
+        'TIMEOUT': 30 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -174,3 +192,76 @@ EMAIL_USE_TLS = False
 EMAIL_HOST_USER = ''
 EMAIL_HOST_PASSWORD = ''
 DEFAULT_FROM_EMAIL = 'mockemail@example.com'
+
+# Scraper browser pool (long-lived Chromium instances shared by all scrapes)
+SCRAPER_HEADLESS = False
+SCRAPER_POOL_BROWSERS = 1
+SCRAPER_POOL_CONTEXTS_PER_BROWSER = 2
+SCRAPER_POOL_MAX_PAGES_PER_CONTEXT = 100  # Recycle a context after this many pages
+SCRAPER_DETAIL_CONCURRENCY = 4  # Product pages opened in parallel tabs by refinement_scraper
+SCRAPER_AVAILABILITY_MODE = "concurrent"  # "concurrent", "deferred" (looked up on selection) or "skip"
+SCRAPER_AVAILABILITY_CONCURRENCY = 4  # Parallel availability lookups in playwright_scraper
+SCRAPER_PAGINATION_MODE = "parallel"  # "parallel" (/s?k=...&page=N in concurrent tabs) or "sequential" (next button)
+SCRAPER_PAGINATION_CONCURRENCY = 5  # Result pages fetched at once in parallel mode
+
+# Request blocking on scraper contexts (see scraper/resource_blocking.py for the default profile)
+SCRAPER_BLOCK_RESOURCES = True
+SCRAPER_BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+# SCRAPER_BLOCKED_URL_PATTERNS = (...)  # Override the default ad/tracking URL patterns
+
+# Reusable Amazon session (Playwright storage_state) shared across runs and processes
+SCRAPER_SESSION_STATE_PATH = BASE_DIR / 'scraper_session.json'
+SCRAPER_SESSION_TTL_MINUTES = 360
+
+# Save fetched product page HTML here so it can be re-parsed offline (python -m scraper.html_parser)
+SCRAPER_HTML_ARCHIVE_DIR = None
+
+# HTTP fast path for refinement_scraper (httpx, keep-alive + HTTP/2); falls back to the browser on CAPTCHA/bad pages
+SCRAPER_HTTP_FAST_PATH = True
+SCRAPER_HTTP_BASE_URL = "https://www.amazon.com"  # Point at a local server of saved pages for testing
+SCRAPER_HTTP_TIMEOUT_SECONDS = 15
+SCRAPER_HTTP_MAX_CONNECTIONS = 10
+
+# Scheduled re-scrape matching: "cards" scores search cards and loads only the winner's page, "details" loads every result
+SCRAPER_MATCH_MODE = "cards"
+SCRAPER_CARD_VERIFY_RATE = 0.1  # Share of card-level winners re-checked on their detail page (price agreement is reported)
+
+# Human-like pacing before navigations (replaces the fixed sleeps; readiness uses selector waits)
+SCRAPER_PACING_MIN_SECONDS = 0.5
+SCRAPER_PACING_MAX_SECONDS = 1.5
+SCRAPER_PACING_MIN_INTERVAL_SECONDS = 0.0  # Minimum gap between any two navigations in the process
+
+# Scrapes run as ScrapeJob rows (see scraper/scrape_jobs.py)
+SCRAPER_JOB_BACKEND = "thread"  # "thread" (in the web process) or "queue" (claimed by `python manage.py scrape_worker` processes)
+SCRAPER_JOB_WORKERS = 2  # Jobs run at once per process
+SCRAPER_JOB_POLL_SECONDS = 2  # Worker wait when the queue is empty
+SCRAPER_JOB_HEARTBEAT_SECONDS = 15
+SCRAPER_JOB_STALE_SECONDS = 120  # Running jobs without a heartbeat for this long are re-queued
+SCRAPER_JOB_MAX_ATTEMPTS = 3
+
+# Store for manual search results awaiting selection: "cache" (the 'scrape_results' cache above, cross-process) or "memory" (per process)
+SCRAPER_RESULT_STORE = "cache"
+SCRAPER_RESULT_TTL_MINUTES = 30
+SCRAPER_RESULT_MAX_ENTRIES = 500  # Memory backend cap (the cache backend uses the cache's MAX_ENTRIES)
+
+# Identical concurrent searches (same normalized query and depth) share one scrape; repeats within the TTL reuse its results
+SCRAPER_COALESCE_TTL_SECONDS = 120  # 0 = only share searches that are in flight at the same time
+SCRAPER_COALESCE_MAX_ENTRIES = 100
+
+# Completed searches are saved to SearchResult; /search/ reuses one younger than this (0 = always scrape, ?refresh=true bypasses)
+SCRAPER_SEARCH_CACHE_MINUTES = 60
+
+# Tracked products re-checked at once by run_scraping (scheduled runs and refresh jobs), sharing the browser pool
+SCRAPER_RUN_CONCURRENCY = 3
+
+# Scheduled scraping: watchlists are picked up in buckets of their scraping_time (GMT+2; must divide 60),
+# each bucket's scrapes are spread at random over the jitter window, at most MAX_CONCURRENT running at once
+# in the scheduler's process (in queue mode that only limits enqueueing — the worker fleet bounds the scraping)
+SCRAPER_SCHEDULE_BUCKET_MINUTES = 15
+SCRAPER_SCHEDULE_JITTER_MINUTES = 10
+SCRAPER_SCHEDULE_MAX_CONCURRENT = 2
+SCRAPER_SCHEDULE_PAGE_BUDGET = 300  # Estimated page loads per day (GMT+2) across all scheduled runs, most urgent products first (None = no limit)
+
+# Adaptive re-scrape interval per product (volatility, recent price change, distance to target), see scheduled_tasks/scrape_frequency.py
+SCRAPER_ADAPTIVE_MIN_HOURS = 12
+SCRAPER_ADAPTIVE_MAX_DAYS = 14
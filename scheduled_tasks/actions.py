@@ -1,9 +1,11 @@
 # actions.py
 
 import os
+import time
+import random
 import asyncio
+from collections import Counter
 from decimal import Decimal, InvalidOperation
-from rapidfuzz import fuzz
 from asgiref.sync import sync_to_async
 
 # ✅ Django setup only once at the top (safe even if re-imported)
@@ -12,140 +14,317 @@ import django
 django.setup()
 
 # ✅ Import Django-dependent modules AFTER setup
-from scraper.refinement_scraper import scrape_amazon
+from django.utils.timezone import now as timezone_now
+from scraper.refinement_scraper import scrape_amazon, scrape_product, scrape_search_cards
+from scraper.config import scraper_setting
+from scraper.html_parser import card_to_product_record
+from scraper.amazon_urls import build_product_url, extract_asin
 from .email_utils import send_notification_email
-from base.models import Watchlist, PriceHistory
+from .due_queue import daily_page_budget
+from .grouping import group_tracked_products
+from .matching import score_matrix
+from base.models import Watchlist, PriceHistory, current_time_gmt2
 from scheduled_tasks.sale_events import get_current_sale_event
 
 
+SIMILARITY_THRESHOLD = 75.0
+
+# What happened to one product in a run_scraping pass (counted in the run summary)
+OUTCOME_SAVED = "saved"
+OUTCOME_ALERTED = "alerted"
+OUTCOME_BELOW_THRESHOLD = "below threshold"
+OUTCOME_NO_RESULTS = "no results"
+OUTCOME_FAILED = "failed"
+
+
+async def match_on_search_cards(search_query, price_checks=None):
+    """
+    Score candidates on the search results page itself and load at most the winner's detail page.
+    The winner is verified on its detail page with probability SCRAPER_CARD_VERIFY_RATE (always if the
+    card has no price); otherwise the card data is used as-is. Returns (best_match, best_score):
+    (None, None) if no card was scraped, (None, 0.0) if none reached SIMILARITY_THRESHOLD.
+    Card vs detail price agreement is counted in `price_checks` ({"checked", "matched"}) when given.
+    """
+    cards = await scrape_search_cards(search_query)
+    if not cards:
+        return None, None
+
+    # ✅ One vectorized scoring call for all cards; the cutoff lets RapidFuzz skip hopeless pairs early
+    titles = [card.get("title") or "" for card in cards]
+    scores = score_matrix([search_query], titles, score_cutoff=SIMILARITY_THRESHOLD)[0]
+    print("\n📌 Search Cards:")
+    for idx, (card, similarity_score) in enumerate(zip(cards, scores)):
+        print(f"  {idx + 1:>2}. {format_score(similarity_score)} — ${card.get('price')} — {titles[idx]}")
+
+    best_index = int(scores.argmax())
+    best_score = float(scores[best_index])
+    if best_score <= 0:
+        return None, 0.0
+    best_card = cards[best_index]
+
+    best_match = card_to_product_record(best_card)
+    verify_rate = scraper_setting("SCRAPER_CARD_VERIFY_RATE", 0.1)
+    needs_detail = best_card["price"] is None or random.random() < verify_rate
+    if best_score >= SIMILARITY_THRESHOLD and needs_detail and best_card["link"]:
+        detail = await scrape_product(product_url=best_card["link"])
+        if detail:
+            if price_checks is not None and best_card["price"] is not None and detail.get("price_numeric") is not None:
+                price_checks["checked"] += 1
+                if Decimal(str(detail["price_numeric"])) == best_card["price"]:
+                    price_checks["matched"] += 1
+                else:
+                    print(f"⚠️ Card price ${best_card['price']} differs from detail price ${detail['price_numeric']}.")
+            best_match = detail
+
+    return {**best_match, "similarity_score": best_score}, best_score
+
+
+def format_score(similarity_score):
+    """A similarity score for the console; scores cut off below SIMILARITY_THRESHOLD are shown as such."""
+    return f"{similarity_score:6.2f}%" if similarity_score > 0 else f"<{SIMILARITY_THRESHOLD:g}%".rjust(7)
+
+
+async def find_best_match(tracked_product, match_mode, price_checks=None):
+    """
+    Steps 2–3: find the tracked product on Amazon. Returns (best_match, best_score), or
+    (None, None) if nothing was scraped and (None, 0.0) if no candidate reached SIMILARITY_THRESHOLD.
+    """
+    search_query = tracked_product.title
+    print(f"\n🔍 Product: {search_query} | Previous Price: ${tracked_product.price} | Target Price: ${tracked_product.target_price}")
+
+    if tracked_product.asin:
+        # Step 2: Known ASIN — load the product page directly, it is the product by definition
+        print(f"🎯 Known ASIN {tracked_product.asin} — loading the product page directly.")
+        product_data = await scrape_product(tracked_product.asin)
+        if not product_data:
+            print("❌ Product page could not be scraped.")
+            return None, None
+        best_score = 100.0
+        best_match = {**product_data, "similarity_score": best_score}
+    elif match_mode == "cards":
+        # Step 2+3: Match on the search results page, load at most the winner's page
+        best_match, best_score = await match_on_search_cards(search_query, price_checks)
+        if best_score is None:
+            print("❌ No products were scraped.")
+            return None, None
+    else:
+        # Step 2: Scrape Amazon
+        products_data = await scrape_amazon(search_query=search_query, persist_browser=False)
+        if not products_data:
+            print("❌ No products were scraped.")
+            return None, None
+
+        # Step 3: Find best match (all candidates scored in one vectorized call, below-threshold pairs cut off)
+        best_match = None
+        best_score = 0.0
+        scores = score_matrix(
+            [search_query], [product.get("title") or "" for product in products_data], score_cutoff=SIMILARITY_THRESHOLD
+        )[0]
+        best_index = int(scores.argmax())
+        if scores[best_index] > 0:
+            best_score = float(scores[best_index])
+            best_match = {**products_data[best_index], "similarity_score": best_score}
+
+        print("\n📌 Scraped Results:")
+        for idx, (product, similarity_score) in enumerate(zip(products_data, scores)):
+            try:
+                title = product.get("title", "No title")
+
+                print(f"\n🔹 Product {idx + 1}/{len(products_data)}:")
+                print(f"  Title            : {title}")
+                print(f"  Price            : {product.get('price', 'N/A')}")
+                print(f"  Numeric Price    : {product.get('price_numeric', 'N/A')}")
+                print(f"  Rating           : {product.get('rating', 'N/A')}")
+                print(f"  Reviews          : {product.get('reviews', 'N/A')}")
+                print(f"  Availability     : {product.get('availability', 'N/A')}")
+                print(f"  URL              : {product.get('url', 'No URL')}")
+                print(f"  Similarity Score : {format_score(similarity_score).strip()}")
+
+            except Exception as e:
+                print(f"⚠️ Error displaying product {idx + 1}: {e}")
+
+    return best_match, best_score
+
+
+async def record_price_point(tracked_product, best_match, event_name=None):
+    """Step 4 for one owner: remember the ASIN, save a PriceHistory row and alert below target. Returns an OUTCOME_* value."""
+    target_price = tracked_product.target_price
+    try:
+        new_price = best_match.get("price_numeric")
+        new_price_decimal = Decimal(str(new_price)) if new_price is not None else None
+        availability = best_match.get("availability", "Unknown")
+
+        # ✅ Remember the matched ASIN so the next re-scrape skips search and matching
+        if not tracked_product.asin:
+            matched_asin = extract_asin(best_match.get("url"))
+            if matched_asin:
+                tracked_product.asin = matched_asin
+                tracked_product.product_url = build_product_url(matched_asin)
+                await sync_to_async(tracked_product.save)(update_fields=["asin", "product_url"])
+                print(f"🏷️ Saved ASIN {matched_asin} for future direct re-scrapes.")
+
+        # ✅ Save to PriceHistory with event_name if available
+        await sync_to_async(PriceHistory.objects.create)(
+            product=tracked_product,
+            product_title_snapshot=tracked_product.title,  # ✅ snapshot
+            price=new_price_decimal,
+            price_numeric=new_price_decimal,
+            availability=availability,
+            event_name=event_name
+        )
+        print(f"🗃️ Price history saved for product {tracked_product.id}. {'📅 Event: ' + event_name if event_name else ''}")
+
+        # 🔔 Trigger alert if new price is below target_price
+        if target_price and new_price_decimal and new_price_decimal < target_price:
+            print(f"\n📉 Price dropped below target price (${target_price}): now ${new_price_decimal:.2f}")
+
+            subject = "📉 Price Alert: Below Target Price!"
+            message = (
+                f"{best_match['title']} has dropped below your target price!\n\n"
+                f"Target Price: ${target_price:.2f}\n"
+                f"Current Price: ${new_price_decimal:.2f}\n\n"
+                f"Link: {best_match['url']}"
+            )
+
+            # ✅ Get the real user email safely using sync_to_async
+            user_email = await sync_to_async(lambda: tracked_product.user.email)()
+            print(f"📧 Sending alert to: {user_email}")
+
+            send_notification_email(subject, message, [user_email])
+            return OUTCOME_ALERTED
+
+        print(f"\nℹ️ No alert sent for product {tracked_product.id}. Price is not below the target.")
+        return OUTCOME_SAVED
+
+    except (InvalidOperation, TypeError) as e:
+        print(f"❌ Price conversion error: {e}")
+        return OUTCOME_FAILED
+
+
+async def scrape_product_group(group, match_mode, event_name=None, price_checks=None):
+    """
+    Re-check one distinct product for everyone tracking it: scrape and match once, then save a
+    PriceHistory row (and alert) per owner. Returns one OUTCOME_* value per product in `group`.
+    """
+    representative = group[0]
+    owners = f" (tracked {len(group)} times)" if len(group) > 1 else ""
+    print(f"\n📦 Processing product: {representative.title}{owners}")
+
+    best_match, best_score = await find_best_match(representative, match_mode, price_checks)
+    if best_score is None:
+        print("\n❌ No best match found.")
+        return [OUTCOME_NO_RESULTS] * len(group)
+    if not best_match:
+        print(f"\n🚫 No candidate reached the {SIMILARITY_THRESHOLD}% threshold. Skipping.")
+        return [OUTCOME_BELOW_THRESHOLD] * len(group)
+
+    print("\n🏆 Best Product Match:")
+    for key, label in {
+        "title": "Title",
+        "price": "Price",
+        "price_numeric": "Price Numeric",
+        "rating": "Rating",
+        "reviews": "Reviews",
+        "availability": "Availability",
+        "url": "URL",
+        "similarity_score": "Similarity Score"
+    }.items():
+        value = best_match.get(key, "N/A")
+        print(f"  {label:<17}: {value if key != 'similarity_score' else f'{value:.2f}%'}")
+
+    if best_score < SIMILARITY_THRESHOLD:
+        print(f"\n🚫 Similarity score {best_score:.2f}% is below the {SIMILARITY_THRESHOLD}% threshold. Skipping.")
+        return [OUTCOME_BELOW_THRESHOLD] * len(group)
+
+    # ✅ Fan the price point out to every owner; one owner's failure doesn't affect the others
+    outcomes = []
+    for tracked_product in group:
+        try:
+            outcomes.append(await record_price_point(tracked_product, best_match, event_name))
+        except Exception as e:
+            print(f"❌ Error saving price for product {tracked_product.id}: {e}")
+            outcomes.append(OUTCOME_FAILED)
+    return outcomes
+
+
+def print_run_summary(products, outcomes, elapsed, scrapes=None):
+    """Print the outcome of a run_scraping pass: counts per outcome and the products that didn't save."""
+    counts = Counter(outcomes)
+    saved = counts[OUTCOME_SAVED] + counts[OUTCOME_ALERTED]
+    print("\n📊 Scraping run summary:")
+    print(f"  Products           : {len(products)}")
+    if scrapes is not None:
+        print(f"  Distinct scrapes   : {scrapes}")
+    print(f"  Price saved        : {saved} ({counts[OUTCOME_ALERTED]} with alert)")
+    print(f"  Below threshold    : {counts[OUTCOME_BELOW_THRESHOLD]}")
+    print(f"  Skipped (no result): {counts[OUTCOME_NO_RESULTS]}")
+    print(f"  Failed             : {counts[OUTCOME_FAILED]}")
+    print(f"  Duration           : {elapsed:.1f}s")
+    for product, outcome in zip(products, outcomes):
+        if outcome not in (OUTCOME_SAVED, OUTCOME_ALERTED):
+            print(f"    - {product.title}: {outcome}")
+
+
 # This is the main scraping engine, used by:
 # 1. The scheduler (for automated runs).
 # 2. The manual product refresh (from the frontend).
 async def run_scraping(filtered_products=None, event_name=None):
+    """
+    Re-check prices of `filtered_products` (as given, e.g. by the scheduler or a manual refresh).
+    Without them, plans the run like the scheduler: the due products of every watchlist with
+    scheduled scraping enabled, most urgent first within what is left of the day's page budget.
+    """
     print("Running scraping process...")
+    match_mode = scraper_setting("SCRAPER_MATCH_MODE", "cards")
 
     try:
         # ✅ If called with a specific list of products (e.g., from scheduler)
         if filtered_products is not None:
             products_to_scrape = filtered_products
         else:
-            # Default: scrape first product from each watchlist
-            watchlists = await sync_to_async(lambda: list(Watchlist.objects.prefetch_related("products").all()))()
-            if not watchlists:
-                print("❌ No watchlists found.")
+            from scheduled_tasks.scheduler import find_active_event, plan_due_products
+
+            today = timezone_now().date()
+            active_event = find_active_event(today)
+            due_products = await sync_to_async(plan_due_products)(today, active_event)
+            selected, deferred, pages = daily_page_budget.select(due_products, today, active_event, day=current_time_gmt2().date())
+            if deferred:
+                print(f"⏭️ {sum(len(group) for group in deferred)} due products deferred by the page budget ({daily_page_budget.describe()}).")
+            products_to_scrape = [product for group in selected for product in group]
+            if not products_to_scrape:
+                print("✅ No watchlist products are due.")
                 return
 
-            products_to_scrape = []
-            for watchlist in watchlists:
-                has_products = await sync_to_async(watchlist.products.exists)()
-                if has_products:
-                    product = await sync_to_async(watchlist.products.first)()
-                    if product:
-                        products_to_scrape.append(product)
-
-        for tracked_product in products_to_scrape:
-            print(f"\n📦 Processing product: {tracked_product.title}")
-            search_query = tracked_product.title
-            old_price = tracked_product.price
-            target_price = tracked_product.target_price
-
-            print(f"\n🔍 Product: {search_query} | Previous Price: ${old_price} | Target Price: ${target_price}")
-
-            # Step 2: Scrape Amazon
-            products_data = await scrape_amazon(search_query=search_query, persist_browser=False)
-            if not products_data:
-                print("❌ No products were scraped.")
-                continue
+        # ✅ Scrape each distinct product once, however many users track it
+        groups = group_tracked_products(products_to_scrape)
 
-            # Step 3: Find best match
-            best_match = None
-            best_score = 0
+        # ✅ Scrape up to SCRAPER_RUN_CONCURRENCY products at once over the shared browser pool
+        concurrency = max(1, scraper_setting("SCRAPER_RUN_CONCURRENCY", 3))
+        semaphore = asyncio.Semaphore(concurrency)
+        # How often the search-card price agreed with the detail-page price, for this run only
+        price_checks = {"checked": 0, "matched": 0}
+        print(f"🧵 Scraping {len(groups)} distinct products for {len(products_to_scrape)} tracked products (concurrency: {concurrency})...")
 
-            print("\n📌 Scraped Results:")
-            for idx, product in enumerate(products_data):
+        async def scrape_with_limit(group):
+            async with semaphore:
                 try:
-                    title = product.get("title", "No title")
-                    similarity_score = fuzz.partial_ratio(search_query.lower(), title.lower()) if title else 0
-
-                    if similarity_score > best_score:
-                        best_score = similarity_score
-                        best_match = {**product, "similarity_score": similarity_score}
-
-                    print(f"\n🔹 Product {idx + 1}/{len(products_data)}:")
-                    print(f"  Title            : {title}")
-                    print(f"  Price            : {product.get('price', 'N/A')}")
-                    print(f"  Numeric Price    : {product.get('price_numeric', 'N/A')}")
-                    print(f"  Rating           : {product.get('rating', 'N/A')}")
-                    print(f"  Reviews          : {product.get('reviews', 'N/A')}")
-                    print(f"  Availability     : {product.get('availability', 'N/A')}")
-                    print(f"  URL              : {product.get('url', 'No URL')}")
-                    print(f"  Similarity Score : {similarity_score:.2f}%")
-
+                    return await scrape_product_group(group, match_mode, event_name, price_checks)
                 except Exception as e:
-                    print(f"⚠️ Error displaying product {idx + 1}: {e}")
-
-            # Step 4: Process best match
-            if best_match:
-                print("\n🏆 Best Product Match:")
-                for key, label in {
-                    "title": "Title",
-                    "price": "Price",
-                    "price_numeric": "Price Numeric",
-                    "rating": "Rating",
-                    "reviews": "Reviews",
-                    "availability": "Availability",
-                    "url": "URL",
-                    "similarity_score": "Similarity Score"
-                }.items():
-                    value = best_match.get(key, "N/A")
-                    print(f"  {label:<17}: {value if key != 'similarity_score' else f'{value:.2f}%'}")
-
-                try:
-                    new_price = best_match.get("price_numeric")
-                    new_price_decimal = Decimal(str(new_price)) if new_price is not None else None
-                    availability = best_match.get("availability", "Unknown")
-                    similarity_threshold = 75.0
-
-                    if best_score < similarity_threshold:
-                        print(f"\n🚫 Similarity score {best_score:.2f}% is below the {similarity_threshold}% threshold. Skipping.")
-                        continue
-
-                    # ✅ Save to PriceHistory with event_name if available
-                    await sync_to_async(PriceHistory.objects.create)(
-                        product=tracked_product,
-                        product_title_snapshot=tracked_product.title,  # ✅ snapshot
-                        price=new_price_decimal,
-                        price_numeric=new_price_decimal,
-                        availability=availability,
-                        event_name=event_name
-                    )
-                    print(f"🗃️ Price history saved. {'📅 Event: ' + event_name if event_name else ''}")
-
-                    # 🔔 Trigger alert if new price is below target_price
-                    if target_price and new_price_decimal and new_price_decimal < target_price:
-                        print(f"\n📉 Price dropped below target price (${target_price}): now ${new_price_decimal:.2f}")
-
-                        subject = "📉 Price Alert: Below Target Price!"
-                        message = (
-                            f"{best_match['title']} has dropped below your target price!\n\n"
-                            f"Target Price: ${target_price:.2f}\n"
-                            f"Current Price: ${new_price_decimal:.2f}\n\n"
-                            f"Link: {best_match['url']}"
-                        )
-
-                        # ✅ Get the real user email safely using sync_to_async
-                        user_email = await sync_to_async(lambda: tracked_product.user.email)()
-                        print(f"📧 Sending alert to: {user_email}")
-
-                        send_notification_email(subject, message, [user_email])
-                    else:
-                        print("\nℹ️ No alert sent. Price is not below the target.")
-
-                except (InvalidOperation, TypeError) as e:
-                    print(f"❌ Price conversion error: {e}")
-            else:
-                print("\n❌ No best match found.")
-
+                    # One product failing must not stop the rest of the run
+                    print(f"❌ Error scraping '{group[0].title}': {e}")
+                    return [OUTCOME_FAILED] * len(group)
+
+        started = time.perf_counter()
+        group_outcomes = await asyncio.gather(*(scrape_with_limit(group) for group in groups))
+        products = [product for group in groups for product in group]
+        outcomes = [outcome for outcomes_of_group in group_outcomes for outcome in outcomes_of_group]
+        print_run_summary(products, outcomes, time.perf_counter() - started, scrapes=len(groups))
+
+        if price_checks["checked"]:
+            print(
+                f"\n🧮 Card vs detail price agreement: {price_checks['matched']}/{price_checks['checked']} "
+                f"({price_checks['matched'] / price_checks['checked']:.0%})"
+            )
         print("\n✅ Scraping process completed.")
 
     except Exception as e:
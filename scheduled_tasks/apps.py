@@ -8,7 +8,7 @@ from scheduled_tasks.scheduler import start_scheduler, scheduler
 
 # This file ensures that:
 # 1. The scheduler starts once when the Django app loads.
-# 2. It registers all scraping jobs (like daily at 03:00).
+# 2. It registers all scraping jobs (watchlists scraped around their scraping_time).
 # 3. It avoids running twice in dev.
 # 4. It shuts down cleanly when Django stops.
 # This is critical for:
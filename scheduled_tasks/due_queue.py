@@ -0,0 +1,111 @@
+# due_queue.py
+
+import heapq
+import threading
+from scraper.config import scraper_setting
+from scheduled_tasks.grouping import group_tracked_products
+from scheduled_tasks.scrape_frequency import price_target_closeness
+
+# Orders the due products of a scheduled run and cuts it to what is left of the day's page budget.
+#
+# Priority (higher first) = days since the last price point (NEVER_SCRAPED_DAYS if none)
+#                           + TARGET_WEIGHT × closeness of the current price to target_price (0–1),
+# with the target term multiplied by SALE_EVENT_TARGET_MULTIPLIER while a sale event is running,
+# since that is when target prices are most likely to be hit.
+#
+# Each distinct product (see group_tracked_products) costs its estimated page loads; products are
+# taken from a heap by priority until the budget is spent. SCRAPER_SCHEDULE_PAGE_BUDGET is a daily
+# (GMT+2) total shared by every scheduled run in the process (DailyPageBudget), charged when the
+# products are planned. Deferred products stay due: they are planned again at their watchlist's next
+# bucket once the budget has reset — the next day — with the staleness they built up meanwhile.
+
+NEVER_SCRAPED_DAYS = 30
+TARGET_WEIGHT = 14
+SALE_EVENT_TARGET_MULTIPLIER = 3
+
+# Page loads per re-check: product page for a known ASIN, search page + winner's page in "cards"
+# mode, search page + every result's page otherwise
+PAGES_WITH_ASIN = 1
+PAGES_CARDS_MODE = 2
+PAGES_FULL_MODE = 20
+
+
+def target_closeness(product):
+    """
+    How close the current price (latest price point, else the tracked price) is to target_price:
+    1.0 at or below target, falling linearly to 0.0 at twice the target. 0.0 without a target.
+    """
+    return price_target_closeness(getattr(product, "last_price", None) or product.price, product.target_price)
+
+
+def product_priority(product, today, active_event=None):
+    """Scheduling priority of one due product (annotated with `last_scraped` by plan_due_products)."""
+    if product.last_scraped is None:
+        staleness = NEVER_SCRAPED_DAYS
+    else:
+        staleness = max(0, (today - product.last_scraped.date()).days)
+    weight = TARGET_WEIGHT * (SALE_EVENT_TARGET_MULTIPLIER if active_event else 1)
+    return staleness + weight * target_closeness(product)
+
+
+def estimated_pages(product, match_mode=None):
+    """Page loads one re-check of `product` is expected to take."""
+    if product.asin:
+        return PAGES_WITH_ASIN
+    match_mode = match_mode or scraper_setting("SCRAPER_MATCH_MODE", "cards")
+    return PAGES_CARDS_MODE if match_mode == "cards" else PAGES_FULL_MODE
+
+
+def select_due_groups(products, today, active_event=None, page_budget=None):
+    """
+    Group the due products, order the groups by priority and keep as many as fit `page_budget`
+    estimated page loads (None = no limit).
+    Returns (selected_groups, deferred_groups, pages), the selected groups highest priority first.
+    """
+    # A group is as urgent as its most urgent owner's copy; the index breaks ties in plan order
+    heap = [
+        (-max(product_priority(product, today, active_event) for product in group), index, group)
+        for index, group in enumerate(group_tracked_products(products))
+    ]
+    heapq.heapify(heap)
+
+    selected, deferred, pages = [], [], 0
+    while heap:
+        _, _, group = heapq.heappop(heap)
+        cost = estimated_pages(group[0])
+        if page_budget is not None and pages + cost > page_budget:
+            # Keep going: a cheaper (known-ASIN) product may still fit
+            deferred.append(group)
+            continue
+        pages += cost
+        selected.append(group)
+    return selected, deferred, pages
+
+
+class DailyPageBudget:
+    """Pages planned for scheduled scraping per day, capped at SCRAPER_SCHEDULE_PAGE_BUDGET across all runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._spent = 0
+
+    def select(self, products, today, active_event=None, day=None):
+        """select_due_groups within what is left of `day`'s budget (default `today`), charging the selected pages."""
+        daily_budget = scraper_setting("SCRAPER_SCHEDULE_PAGE_BUDGET", None)
+        day = day or today
+        with self._lock:
+            if day != self._day:
+                self._day, self._spent = day, 0
+            remaining = None if daily_budget is None else max(0, daily_budget - self._spent)
+            selected, deferred, pages = select_due_groups(products, today, active_event, page_budget=remaining)
+            self._spent += pages
+            return selected, deferred, pages
+
+    def describe(self):
+        daily_budget = scraper_setting("SCRAPER_SCHEDULE_PAGE_BUDGET", None)
+        with self._lock:
+            return f"{self._spent}/{daily_budget if daily_budget is not None else '∞'} pages planned on {self._day}"
+
+
+daily_page_budget = DailyPageBudget()
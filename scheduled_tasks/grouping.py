@@ -0,0 +1,29 @@
+# grouping.py
+
+from scraper.amazon_urls import normalize_query
+
+# Which tracked products are the same Amazon item. Pure (no Django or scraper imports), so the
+# planner (due_queue.py) can group rows without loading the scraping engine in actions.py.
+
+
+def group_tracked_products(products):
+    """
+    Group tracked products that are the same Amazon item — by ASIN when any owner's copy has one,
+    otherwise by normalized title — so each item is scraped once for all of its owners.
+    An ASIN-less copy joins an ASIN group only if every known ASIN for its title is that one.
+    Products with a known ASIN come first in their group.
+    """
+    asins_by_title = {}
+    for product in products:
+        if product.asin:
+            asins_by_title.setdefault(normalize_query(product.title), set()).add(product.asin)
+    asin_by_title = {title: next(iter(asins)) for title, asins in asins_by_title.items() if len(asins) == 1}
+
+    groups = {}
+    for product in products:
+        asin = product.asin or asin_by_title.get(normalize_query(product.title))
+        key = ("asin", asin) if asin else ("title", normalize_query(product.title))
+        groups.setdefault(key, []).append(product)
+    for members in groups.values():
+        members.sort(key=lambda product: product.asin is None)
+    return list(groups.values())
@@ -0,0 +1,123 @@
+# matching.py
+
+import os
+import sys
+import time
+import random
+from collections import namedtuple
+from rapidfuzz import fuzz, process
+from scraper.amazon_urls import normalize_query
+
+# Fuzzy matching of scraped candidate titles against tracked product titles.
+# Titles are normalized once up front, then every query is scored against every
+# candidate in a single vectorized RapidFuzz call (process.cdist, multi-threaded)
+# instead of one fuzz.partial_ratio call per pair.
+
+Match = namedtuple("Match", ["index", "score"])
+
+
+def score_matrix(queries, candidates, scorer=fuzz.partial_ratio, score_cutoff=None, workers=-1):
+    """
+    Score every query against every candidate in one call.
+    Returns a len(queries) x len(candidates) numpy array; scores under `score_cutoff` are 0.
+    """
+    return process.cdist(
+        [normalize_query(query) for query in queries],
+        [normalize_query(candidate) for candidate in candidates],
+        scorer=scorer,
+        score_cutoff=score_cutoff,
+        workers=workers,
+    )
+
+
+def best_matches(queries, candidates, scorer=fuzz.partial_ratio, score_cutoff=None, workers=-1):
+    """
+    Best candidate for each query: a list of Match(index, score), or None where no candidate
+    scores above 0 (or reaches `score_cutoff`). Ties go to the earliest candidate.
+    """
+    if not candidates:
+        return [None for _ in queries]
+    scores = score_matrix(queries, candidates, scorer, score_cutoff, workers)
+    best_indexes = scores.argmax(axis=1)
+    matches = []
+    for row, index in enumerate(best_indexes):
+        score = float(scores[row, index])
+        matches.append(Match(int(index), score) if score > 0 else None)
+    return matches
+
+
+def best_match(query, candidates, scorer=fuzz.partial_ratio, score_cutoff=None):
+    """Best candidate for a single query as Match(index, score), or None."""
+    result = process.extractOne(
+        normalize_query(query),
+        [normalize_query(candidate) for candidate in candidates],
+        scorer=scorer,
+        processor=None,
+        score_cutoff=score_cutoff,
+    )
+    if not result or result[1] <= 0:
+        return None
+    return Match(result[2], float(result[1]))
+
+
+# -------------------------------
+# Microbenchmark
+# -------------------------------
+
+def _loop_best_matches(queries, candidates):
+    """The per-pair Python loop the matcher replaces (kept for the benchmark and result check)."""
+    matches = []
+    for query in queries:
+        best, best_score = None, 0
+        for index, candidate in enumerate(candidates):
+            score = fuzz.partial_ratio(query.lower(), candidate.lower()) if candidate else 0
+            if score > best_score:
+                best, best_score = index, score
+        matches.append(Match(best, float(best_score)) if best is not None else None)
+    return matches
+
+
+def _synthetic_titles(count, rng):
+    words = (
+        "wireless bluetooth headphones noise cancelling over ear black usb c charger fast 65w laptop "
+        "stainless steel water bottle insulated 32 oz kitchen knife set block gaming mouse rgb "
+        "ergonomic office chair mesh 4k monitor 27 inch portable ssd 1tb smart watch fitness tracker"
+    ).split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(5, 12))).title() for _ in range(count)]
+
+
+# ✅ python -m scheduled_tasks.matching [QUERIES] [CANDIDATES] [SCORE_CUTOFF]
+if __name__ == "__main__":
+    query_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    candidate_count = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    score_cutoff = float(sys.argv[3]) if len(sys.argv) > 3 else 75.0
+    rng = random.Random(42)
+    queries = _synthetic_titles(query_count, rng)
+    candidates = _synthetic_titles(candidate_count, rng)
+    print(f"Matching {query_count} tracked titles against {candidate_count} candidates "
+          f"({query_count * candidate_count:,} pairs, {os.cpu_count()} CPU(s))")
+
+    def timed(label, fn, baseline_ms=None):
+        started = time.perf_counter()
+        result = fn()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        speedup = f"  ({baseline_ms / elapsed_ms:.1f}x)" if baseline_ms else ""
+        print(f"  {label:<46} {elapsed_ms:8.1f} ms{speedup}")
+        return result, elapsed_ms
+
+    loop_result, loop_ms = timed("Python loop (fuzz.partial_ratio per pair)", lambda: _loop_best_matches(queries, candidates))
+    vector_result, _ = timed("process.cdist, no cutoff", lambda: best_matches(queries, candidates), loop_ms)
+    cutoff_result, _ = timed(f"process.cdist, score_cutoff={score_cutoff:g}",
+                             lambda: best_matches(queries, candidates, score_cutoff=score_cutoff), loop_ms)
+    timed(f"process.extractOne per query, cutoff={score_cutoff:g}",
+          lambda: [best_match(query, candidates, score_cutoff=score_cutoff) for query in queries], loop_ms)
+    timed("process.cdist with fuzz.ratio (for reference)",
+          lambda: best_matches(queries, candidates, scorer=fuzz.ratio), loop_ms)
+
+    agree = sum(
+        (a is None and b is None) or (a is not None and b is not None and a.index == b.index)
+        for a, b in zip(loop_result, vector_result)
+    )
+    print(f"  Same best candidate as the loop: {agree}/{query_count}")
+    above = sum(match is not None for match in cutoff_result)
+    print(f"  Queries with a match at or above {score_cutoff:g}: {above}/{query_count}")
@@ -1,83 +1,155 @@
 import asyncio
-from datetime import timedelta
+import random
+import threading
+from datetime import time, timedelta
+from django.db import close_old_connections
+from django.db.models import DateTimeField, DecimalField, OuterRef, Q, Subquery
 from django.utils.timezone import now as timezone_now
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
 from scheduled_tasks.sale_events import sale_events
+from scraper.config import scraper_setting
 from asgiref.sync import sync_to_async
 
 scheduler = BackgroundScheduler()
 
+# Scheduled scraping runs in time buckets instead of one nightly burst.
+# Every SCRAPER_SCHEDULE_BUCKET_MINUTES the scheduler takes the enabled watchlists whose scraping_time
+# (GMT+2) falls in the bucket that just started, plans their due products, and adds one one-off job
+# per distinct product at a random moment within the next SCRAPER_SCHEDULE_JITTER_MINUTES.
+# Those jobs run on their own executor of SCRAPER_SCHEDULE_MAX_CONCURRENT threads — the ceiling on
+# scheduled scrapes running at once in this (the scheduler's) process, however many buckets overlap.
+# In queue mode the jobs only enqueue refresh jobs, so there it limits the enqueueing; the scraping
+# itself is bounded by the scrape workers (their number × --concurrency).
+
+SCRAPES_EXECUTOR = "scheduled_scrapes"
+
+# Products planned but not scraped yet, so an overlapping bucket doesn't plan them twice
+_pending_product_ids = set()
+_pending_lock = threading.Lock()
+
+
+def find_active_event(today):
+    """The sale event running on `today`, or None."""
+    for event in sale_events:
+        if event["start"].date() <= today <= event["end"].date():
+            return event
+    return None
+
+
+def bucket_bounds(moment, bucket_minutes):
+    """The [start, end) scraping_time range of the bucket containing `moment` (end is None for the day's last bucket)."""
+    minute_of_day = moment.hour * 60 + moment.minute
+    start_minute = minute_of_day - minute_of_day % bucket_minutes
+    end_minute = start_minute + bucket_minutes
+    start = time(start_minute // 60, start_minute % 60)
+    end = time(end_minute // 60, end_minute % 60) if end_minute < 24 * 60 else None
+    return start, end
+
+
+def watchlists_in_bucket(start, end):
+    """Watchlists whose scraping_time falls in [start, end)."""
+    from base.models import Watchlist
+
+    watchlists = Watchlist.objects.filter(scraping_time__gte=start)
+    return watchlists.filter(scraping_time__lt=end) if end else watchlists
+
+
+def plan_due_products(today, active_event=None, watchlists=None, now=None):
+    """
+    Tracked products due for a scheduled scrape, computed in a single query.
+
+    Takes every product of every watchlist with scheduled scraping enabled, on the watchlist and
+    for its owner (optionally only among `watchlists`), annotates each with its latest PriceHistory
+    date and price (`last_scraped`, `last_price`), and keeps those never scraped, those whose
+    adaptive next_scrape_due has passed (`now`, GMT+2 like date_recorded), and — during a sale
+    event — those not scraped within the event. Products without next_scrape_due yet fall back
+    to the 7-day rule.
+    """
+    from base.models import PriceHistory, TrackedProduct, Watchlist, current_time_gmt2
+
+    watchlists = Watchlist.objects.all() if watchlists is None else watchlists
+    watched_products = (
+        watchlists
+        .filter(scheduled_scraping_enabled=True, user__userprofile__scheduled_scraping_enabled=True)
+        .values("products__id")
+    )
+    latest_history = PriceHistory.objects.filter(product=OuterRef("pk")).order_by("-date_recorded")
+
+    now = now or current_time_gmt2()
+    due = (
+        Q(next_scrape_due__lte=now)
+        | Q(next_scrape_due__isnull=True, last_scraped__date__lt=today - timedelta(days=7))
+    )
+    if active_event:
+        due |= Q(last_scraped__date__lt=active_event["start"].date()) | Q(last_scraped__date__gt=active_event["end"].date())
+
+    return list(
+        TrackedProduct.objects
+        .filter(id__in=Subquery(watched_products))
+        .annotate(
+            last_scraped=Subquery(latest_history.values("date_recorded")[:1], output_field=DateTimeField()),
+            last_price=Subquery(latest_history.values("price_numeric")[:1], output_field=DecimalField()),
+        )
+        .filter(Q(last_scraped__isnull=True) | due)
+        .select_related("user")
+        .order_by("id")
+    )
+
+
 async def async_scraping_wrapper():
-    """Runs scraping for the first product of each watchlist based on sale event or 7-day rules."""
+    """
+    Runs scraping for the due products of every watchlist (sale event and adaptive due times),
+    highest priority first within the page budget, for every watchlist at once regardless of
+    scraping_time (manual runs, see test_scheduler.py).
+    """
     try:
         print("⏳ Running scheduled scraping...")
 
-        from base.models import Watchlist
         from scheduled_tasks.actions import run_scraping
+        from base.models import current_time_gmt2
+        from scheduled_tasks.due_queue import daily_page_budget
+        from scraper.scrape_jobs import enqueue_refresh_job
 
         today = timezone_now().date()
 
         # Step 1: Check if today is within a sale event
-        active_event = None
-        for event in sale_events:
-            if event["start"].date() <= today <= event["end"].date():
-                active_event = event
-                break
+        active_event = find_active_event(today)
 
         print(f"📆 Today: {today} — Sale Event: {active_event['name'] if active_event else 'None'}")
 
-        # Step 2: Load all watchlists where user's scraping is enabled
-        watchlists = await sync_to_async(
-            lambda: list(
-                Watchlist.objects.prefetch_related("products")
-                .filter(user__userprofile__scheduled_scraping_enabled=True)
-            )
-        )()
-
-        products_to_scrape = []
-
-        for watchlist in watchlists:
-            has_products = await sync_to_async(watchlist.products.exists)()
-            if not has_products:
-                continue
+        # Step 2: One query for the whole plan — every product in an enabled watchlist, its latest
+        # price history, and whether that falls outside the current scraping window
+        due_products = await sync_to_async(plan_due_products)(today, active_event)
 
-            # Only take the first product in the watchlist
-            tracked_product = await sync_to_async(watchlist.products.first)()
-            if not tracked_product:
-                continue
+        # Step 3: Most urgent first, as many as the day's remaining page budget allows
+        selected, deferred, pages = daily_page_budget.select(due_products, today, active_event, day=current_time_gmt2().date())
+        products_to_scrape = [product for group in selected for product in group]
 
-            # Check the product's most recent price history
-            latest_history = await sync_to_async(
-                lambda: tracked_product.price_history.order_by("-date_recorded").first()
-            )()
-
-            if not latest_history:
-                # No scrape history — must scrape
+        for tracked_product in products_to_scrape:
+            if tracked_product.last_scraped is None:
                 print(f"🆕 Product '{tracked_product.title}' has no price history — adding to scrape.")
-                products_to_scrape.append(tracked_product)
-                continue
-
-            last_scraped_date = latest_history.date_recorded.date()
-
-            if active_event:
-                # If sale event is active, check if last scrape was during it
-                if not (active_event["start"].date() <= last_scraped_date <= active_event["end"].date()):
-                    print(f"📢 Product '{tracked_product.title}' not scraped during '{active_event['name']}' — adding to scrape.")
-                    products_to_scrape.append(tracked_product)
-                else:
-                    print(f"✅ Product '{tracked_product.title}' already scraped during '{active_event['name']}' — skipping.")
+            elif active_event and not active_event["start"].date() <= tracked_product.last_scraped.date() <= active_event["end"].date():
+                print(f"📢 Product '{tracked_product.title}' not scraped during '{active_event['name']}' — adding to scrape.")
+            elif tracked_product.next_scrape_due:
+                print(f"⏱️ Product '{tracked_product.title}' was due on {tracked_product.next_scrape_due:%Y-%m-%d %H:%M} — adding to scrape.")
             else:
-                # No sale event — check if last scrape was over 7 days ago
-                if (today - last_scraped_date) > timedelta(days=7):
-                    print(f"📆 Product '{tracked_product.title}' last scraped on {last_scraped_date} — adding to scrape.")
-                    products_to_scrape.append(tracked_product)
-                else:
-                    print(f"✅ Product '{tracked_product.title}' scraped recently ({last_scraped_date}) — skipping.")
+                print(f"📆 Product '{tracked_product.title}' last scraped on {tracked_product.last_scraped.date()} — adding to scrape.")
 
-        print(f"🧩 Total products to scrape today: {len(products_to_scrape)}")
+        print(f"🧩 Total products to scrape today: {len(products_to_scrape)} (~{pages} pages)")
+        if deferred:
+            print(f"⏭️ {sum(len(group) for group in deferred)} due products deferred by the page budget ({daily_page_budget.describe()}).")
 
-        if products_to_scrape:
+        if products_to_scrape and scraper_setting("SCRAPER_JOB_BACKEND", "thread") == "queue":
+            # ✅ Hand the run to the scrape worker fleet instead of scraping in this process
+            job = await sync_to_async(enqueue_refresh_job)(
+                products_to_scrape,
+                event_name=active_event["name"] if active_event else None
+            )
+            print(f"📥 Queued refresh job {job.id} for the scrape workers.")
+        elif products_to_scrape:
             await run_scraping(
                 filtered_products=products_to_scrape,
                 event_name=active_event["name"] if active_event else None
@@ -89,18 +161,120 @@ async def async_scraping_wrapper():
     except Exception as e:
         print(f"❌ Error during scheduled scraping: {e}")
 
+def schedule_bucket():
+    """APScheduler job: plan the bucket that just started and spread its scrapes over the jitter window."""
+    from base.models import current_time_gmt2
+    from scheduled_tasks.due_queue import daily_page_budget
+
+    close_old_connections()
+    try:
+        bucket_minutes = scraper_setting("SCRAPER_SCHEDULE_BUCKET_MINUTES", 15)
+        window_seconds = scraper_setting("SCRAPER_SCHEDULE_JITTER_MINUTES", 10) * 60
+        local_now = current_time_gmt2()
+        start, end = bucket_bounds(local_now, bucket_minutes)
+        bucket_name = f"{start:%H:%M}–{end:%H:%M}" if end else f"{start:%H:%M}–24:00"
+
+        today = timezone_now().date()
+        active_event = find_active_event(today)
+        products = plan_due_products(today, active_event, watchlists=watchlists_in_bucket(start, end))
+
+        with _pending_lock:
+            products = [product for product in products if product.id not in _pending_product_ids]
+            groups, deferred, pages = daily_page_budget.select(products, today, active_event, day=local_now.date())
+            _pending_product_ids.update(product.id for group in groups for product in group)
+
+        if deferred:
+            print(
+                f"⏭️ Bucket {bucket_name}: {sum(len(group) for group in deferred)} due products deferred to the "
+                f"watchlist's next bucket after the daily page budget resets ({daily_page_budget.describe()})."
+            )
+        if not groups:
+            if not deferred:
+                print(f"✅ Bucket {bucket_name}: no scraping needed.")
+            return
+
+        # ✅ One job per distinct product at random moments in the window — the earliest go to the most urgent
+        event_name = active_event["name"] if active_event else None
+        bucket_started = timezone_now()
+        offsets = sorted(random.uniform(0, window_seconds) for _ in groups)
+        for group, offset in zip(groups, offsets):
+            scheduler.add_job(
+                run_scheduled_group,
+                trigger=DateTrigger(run_date=bucket_started + timedelta(seconds=offset)),
+                args=[[product.id for product in group], event_name],
+                executor=SCRAPES_EXECUTOR,
+                misfire_grace_time=None,  # Wait for a free slot rather than being skipped
+            )
+        print(
+            f"🪣 Bucket {bucket_name}: {sum(len(group) for group in groups)} products ({len(groups)} scrapes, ~{pages} pages) "
+            f"spread over the next {window_seconds // 60} min."
+        )
+    except Exception as e:
+        print(f"❌ Error planning scheduled scraping: {e}")
+    finally:
+        close_old_connections()
+
+
+def run_scheduled_group(product_ids, event_name=None):
+    """APScheduler job: scrape one planned product (all of its owners' copies)."""
+    from base.models import TrackedProduct
+    from scheduled_tasks.actions import run_scraping
+    from scraper.scrape_jobs import enqueue_refresh_job, job_backend
+
+    close_old_connections()
+    try:
+        products = list(TrackedProduct.objects.filter(id__in=product_ids).select_related("user"))
+        if not products:
+            return
+        if job_backend() == "queue":
+            # ✅ The worker fleet does the scraping; the jitter still spreads the enqueues
+            job = enqueue_refresh_job(products, event_name=event_name)
+            print(f"📥 Queued refresh job {job.id} for the scrape workers.")
+        else:
+            asyncio.run(run_scraping(filtered_products=products, event_name=event_name))
+    except Exception as e:
+        print(f"❌ Error during scheduled scraping: {e}")
+    finally:
+        with _pending_lock:
+            _pending_product_ids.difference_update(product_ids)
+        close_old_connections()
+
+
 def start_scheduler():
-    """Starts the daily scraping scheduler at 03:00 AM."""
+    """Starts the bucketed scraping scheduler (watchlists are scraped around their scraping_time)."""
     try:
+        bucket_minutes = scraper_setting("SCRAPER_SCHEDULE_BUCKET_MINUTES", 15)
+        if bucket_minutes <= 0 or 60 % bucket_minutes:
+            raise ValueError(f"SCRAPER_SCHEDULE_BUCKET_MINUTES must divide 60 (got {bucket_minutes}).")
+        max_concurrent = max(1, scraper_setting("SCRAPER_SCHEDULE_MAX_CONCURRENT", 2))
+
+        scheduler.add_executor(ThreadPoolExecutor(max_concurrent), alias=SCRAPES_EXECUTOR)
         scheduler.add_job(
-            lambda: asyncio.run(async_scraping_wrapper()),
-            # trigger=CronTrigger(hour=3, minute=0),
-            trigger=CronTrigger(hour=20, minute=35),
-            id="daily_scheduled_scraping",
+            schedule_bucket,
+            trigger=CronTrigger(minute=f"*/{bucket_minutes}"),
+            id="scheduled_scraping_buckets",
+            # A late tick (busy or paused scheduler) still plans its bucket instead of skipping those
+            # watchlists for the day — as long as it fires before the bucket ends, since the bucket is
+            # taken from the clock; several missed ticks collapse into one run
+            misfire_grace_time=bucket_minutes * 60 - 1,
+            coalesce=True,
             replace_existing=True
         )
 
+        from scraper.scrape_jobs import job_backend, resume_orphaned_jobs
+        if job_backend() == "thread":
+            # No worker fleet reclaims jobs in thread mode: pick up what a previous process left behind
+            scheduler.add_job(
+                resume_orphaned_jobs,
+                trigger="interval",
+                seconds=scraper_setting("SCRAPER_JOB_STALE_SECONDS", 120),
+                next_run_time=timezone_now(),
+                id="resume_orphaned_jobs",
+                coalesce=True,
+                replace_existing=True
+            )
+
         scheduler.start()
-        print("✅ Scheduler started. Scraping will run daily at 03:00.")
+        print(f"✅ Scheduler started. Watchlists are scraped in {bucket_minutes}-minute buckets (max {max_concurrent} at once).")
     except Exception as e:
         print(f"❌ Error starting scheduler: {e}")
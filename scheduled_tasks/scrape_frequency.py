@@ -0,0 +1,69 @@
+# scrape_frequency.py
+
+from datetime import timedelta
+from scraper.config import scraper_setting
+
+# Adaptive re-scrape interval per tracked product, updated on every new PriceHistory row
+# (see the post_save receiver in base/models.py) from three running signals kept on the product:
+#
+#   - price_volatility: moving average of the relative price change between consecutive points
+#   - price_changed_at: when the price last moved
+#   - distance of the current price to target_price
+#
+# interval = SCRAPER_ADAPTIVE_MAX_DAYS
+#            ÷ (1 + VOLATILITY_WEIGHT × volatility)
+#            × RECENT_CHANGE_FACTOR if the price moved within RECENT_CHANGE_WINDOW
+#            × (1 − TARGET_FACTOR × closeness to target)
+# clamped to [SCRAPER_ADAPTIVE_MIN_HOURS, SCRAPER_ADAPTIVE_MAX_DAYS], and stored as next_scrape_due.
+# Only the previous price point is read, so the cost per insert stays constant.
+
+VOLATILITY_SMOOTHING = 0.3  # Weight of the newest change in the moving average
+VOLATILITY_WEIGHT = 20  # An average move of 5% halves the interval
+RECENT_CHANGE_WINDOW = timedelta(days=7)
+RECENT_CHANGE_FACTOR = 0.5
+TARGET_FACTOR = 0.75  # At or below target the interval is a quarter
+
+
+def price_target_closeness(current_price, target_price):
+    """1.0 at or below target_price, falling linearly to 0.0 at twice the target. 0.0 without a target."""
+    if not target_price or not current_price:
+        return 0.0
+    if current_price <= target_price:
+        return 1.0
+    return max(0.0, 1.0 - float((current_price - target_price) / target_price))
+
+
+def update_volatility(volatility, previous_price, new_price):
+    """Fold the change from `previous_price` to `new_price` into the moving average (unchanged if either is missing)."""
+    if not previous_price or new_price is None:
+        return volatility
+    change = abs(float((new_price - previous_price) / previous_price))
+    return (1 - VOLATILITY_SMOOTHING) * (volatility or 0.0) + VOLATILITY_SMOOTHING * change
+
+
+def next_scrape_interval(volatility, price_changed_at, current_price, target_price, now):
+    """How long to wait before re-scraping a product in this state."""
+    min_interval = timedelta(hours=scraper_setting("SCRAPER_ADAPTIVE_MIN_HOURS", 12))
+    max_interval = timedelta(days=scraper_setting("SCRAPER_ADAPTIVE_MAX_DAYS", 14))
+
+    interval = max_interval / (1 + VOLATILITY_WEIGHT * (volatility or 0.0))
+    if price_changed_at and now - price_changed_at < RECENT_CHANGE_WINDOW:
+        interval *= RECENT_CHANGE_FACTOR
+    interval *= 1 - TARGET_FACTOR * price_target_closeness(current_price, target_price)
+    return min(max(interval, min_interval), max_interval)
+
+
+def apply_price_point(product, previous_price, new_price, recorded_at):
+    """
+    Update the product's volatility, price_changed_at and next_scrape_due for a new price point.
+    Returns the names of the changed fields (for save(update_fields=...)).
+    """
+    product.price_volatility = update_volatility(product.price_volatility, previous_price, new_price)
+    if new_price is not None and previous_price is not None and new_price != previous_price:
+        product.price_changed_at = recorded_at
+
+    current_price = new_price if new_price is not None else previous_price
+    product.next_scrape_due = recorded_at + next_scrape_interval(
+        product.price_volatility, product.price_changed_at, current_price, product.target_price, recorded_at
+    )
+    return ["price_volatility", "price_changed_at", "next_scrape_due"]
@@ -0,0 +1,45 @@
+# amazon_urls.py
+
+import re
+from urllib.parse import urlencode, unquote
+
+AMAZON_BASE_URL = "https://www.amazon.com"
+
+ASIN_VALUE = r"[A-Z0-9]{10}"
+
+# /dp/<ASIN>, /gp/product/<ASIN>, /gp/aw/d/<ASIN> — also inside url-encoded sponsored (/sspa/click) links
+ASIN_PATTERN = re.compile(rf"/(?:dp|gp/product|gp/aw/d)/({ASIN_VALUE})(?:[/?&]|$)")
+
+
+def build_search_url(search_query, page=1):
+    """Build the Amazon search results URL for a query (and optional results page)."""
+    params = {"k": search_query}
+    if page > 1:
+        params["page"] = page
+    return f"{AMAZON_BASE_URL}/s?{urlencode(params)}"
+
+
+def extract_asin(url):
+    """Pull the ASIN out of an Amazon product link, or None if it has none."""
+    if not url:
+        return None
+    match = ASIN_PATTERN.search(unquote(url))
+    return match.group(1) if match else None
+
+
+def is_valid_asin(value):
+    """True if `value` looks like an ASIN (10 upper-case letters or digits)."""
+    return isinstance(value, str) and re.fullmatch(ASIN_VALUE, value) is not None
+
+
+def build_product_url(asin):
+    """Canonical product page URL for an ASIN."""
+    return f"{AMAZON_BASE_URL}/dp/{asin}"
+
+
+def normalize_query(search_query):
+    """
+    Canonical form of a search query or product title (case and whitespace don't change Amazon's
+    results). Search-cache keys, product grouping and title matching all use it.
+    """
+    return " ".join((search_query or "").lower().split())
@@ -0,0 +1,338 @@
+# browser_pool.py
+
+import asyncio
+import atexit
+import queue
+import time
+import threading
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from scraper.amazon_urls import AMAZON_BASE_URL
+from scraper.captcha import CAPTCHA_BOX_SELECTOR, solve_captcha
+from scraper.config import scraper_setting
+from scraper.pacing import pace, record_removed_sleep
+from scraper.resource_blocking import build_resource_blocker
+from scraper.session_state import (
+    load_session_state, save_session_state, invalidate_session_state, session_ttl_seconds
+)
+
+# -------------------------------
+# Shared Context Configuration
+# -------------------------------
+
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
+    "extra_http_headers": {
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-US,en;q=0.5",
+        "Connection": "keep-alive",
+        "DNT": "1",
+        "Upgrade-Insecure-Requests": "1",
+    },
+    "locale": "en-US",
+    "geolocation": {"latitude": 37.7749, "longitude": -122.4194},
+    "timezone_id": "America/Los_Angeles",
+}
+
+# Average of the old random 2–10 s homepage settle sleeps, reported as idle time removed
+WARM_UP_SETTLE_SECONDS = 5.0
+
+SESSION_COOKIES = [
+    {"name": "session-id", "value": "133-1234567-1234567", "domain": ".amazon.com", "path": "/"},
+    {"name": "session-id-time", "value": "2082787201l", "domain": ".amazon.com", "path": "/"},
+    {"name": "ubid-main", "value": "133-1234567-1234567", "domain": ".amazon.com", "path": "/"},
+    {"name": "x-main", "value": "x-main-cookie-value", "domain": ".amazon.com", "path": "/"},
+]
+
+
+# -------------------------------
+# Pooled Context
+# -------------------------------
+
+class PooledContext:
+    """A browser context owned by the pool, leased to one scrape at a time."""
+
+    def __init__(self, pool, slot, browser, context, warmed_at=None, blocking_stats=None):
+        self.pool = pool
+        self.slot = slot
+        self.browser = browser
+        self.context = context
+        self.pages_opened = 0
+        self.warmed_at = warmed_at
+        self.blocking_stats = blocking_stats
+
+    @property
+    def warmed_up(self):
+        """True while the context holds a session that is still within the session TTL."""
+        return self.warmed_at is not None and time.monotonic() - self.warmed_at < session_ttl_seconds()
+
+    def describe_blocking(self):
+        """One-line summary of the resource blocker counters for the current lease (empty if blocking is off)."""
+        return self.blocking_stats.describe() if self.blocking_stats else ""
+
+    async def new_page(self):
+        """Open a page in this context and count it towards the recycle limit."""
+        self.pages_opened += 1
+        return await self.context.new_page()
+
+    async def warm_up(self, page):
+        """Open the Amazon homepage, clear any CAPTCHA and persist the session for reuse."""
+        await pace()
+        await page.goto(AMAZON_BASE_URL, wait_until="domcontentloaded")
+        # ✅ Ready as soon as the search bar exists (or a CAPTCHA form is shown)
+        try:
+            await page.wait_for_selector(f"input[name='field-keywords'], {CAPTCHA_BOX_SELECTOR}")
+        except PlaywrightTimeoutError:
+            print("⚠️ Homepage didn't show the search bar — continuing.")
+        record_removed_sleep(WARM_UP_SETTLE_SECONDS)
+        await solve_captcha(page)
+        await self._remember_session()
+
+    async def handle_captcha(self, page):
+        """Solve a CAPTCHA shown to a reused session, then store the refreshed session."""
+        if not await page.is_visible(CAPTCHA_BOX_SELECTOR):
+            return
+        print("⚠️ Stored session was challenged — refreshing it.")
+        invalidate_session_state()
+        await solve_captcha(page)
+        await self._remember_session()
+
+    async def _remember_session(self):
+        self.warmed_at = time.monotonic()
+        save_session_state(await self.context.storage_state())
+
+
+# -------------------------------
+# Browser Pool
+# -------------------------------
+
+class BrowserPool:
+    """
+    Long-lived pool of Chromium browsers (N browsers × M contexts).
+    Contexts are leased to scrapes and returned afterwards, recycled after
+    `max_pages_per_context` pages, and rebuilt if their browser disconnects.
+    If a resource_blocker is given, it is installed on every context.
+    Must be used from a single event loop (see run_in_pool).
+    """
+
+    def __init__(self, browsers=1, contexts_per_browser=2, max_pages_per_context=100, headless=False, resource_blocker=None):
+        self.browsers = browsers
+        self.contexts_per_browser = contexts_per_browser
+        self.max_pages_per_context = max_pages_per_context
+        self.headless = headless
+        self.resource_blocker = resource_blocker
+        self._playwright = None
+        self._browsers = []
+        self._idle = None
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+
+    async def start(self):
+        """Launch the browsers and fill the idle queue with contexts (no-op if already started)."""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            print(f"🚀 Starting browser pool: {self.browsers} browser(s) × {self.contexts_per_browser} context(s)")
+            self._playwright = await async_playwright().start()
+            idle = asyncio.Queue()
+            for slot in range(self.browsers):
+                self._browsers.append(await self._launch_browser())
+                for _ in range(self.contexts_per_browser):
+                    await idle.put(await self._new_context(slot))
+            self._idle = idle
+
+    async def _launch_browser(self):
+        return await self._playwright.chromium.launch(headless=self.headless)
+
+    async def _new_context(self, slot):
+        browser = self._browsers[slot]
+        storage_state, age = load_session_state()
+        if storage_state:
+            # ✅ Reuse the stored Amazon session: no homepage warm-up needed
+            context = await browser.new_context(storage_state=storage_state, **CONTEXT_OPTIONS)
+        else:
+            context = await browser.new_context(**CONTEXT_OPTIONS)
+            await context.add_cookies(SESSION_COOKIES)
+        blocking_stats = await self.resource_blocker.attach(context) if self.resource_blocker else None
+        return PooledContext(
+            self, slot, browser, context,
+            warmed_at=time.monotonic() - age if storage_state else None,
+            blocking_stats=blocking_stats,
+        )
+
+    async def _ensure_healthy(self, pooled):
+        """Return a usable context: relaunch a dead browser, recycle a worn-out context."""
+        if not self._browsers[pooled.slot].is_connected():
+            print(f"♻️ Browser {pooled.slot} disconnected — relaunching.")
+            self._browsers[pooled.slot] = await self._launch_browser()
+
+        if pooled.browser is not self._browsers[pooled.slot]:
+            return await self._new_context(pooled.slot)
+
+        if pooled.pages_opened >= self.max_pages_per_context:
+            print(f"♻️ Recycling context on browser {pooled.slot} after {pooled.pages_opened} pages.")
+            await self._close_context(pooled)
+            return await self._new_context(pooled.slot)
+
+        return pooled
+
+    async def _close_context(self, pooled):
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            print(f"⚠️ Error closing browser context: {e}")
+
+    async def _release(self, pooled):
+        """Close pages left open by the scrape and put the context back in the queue."""
+        if self._closed:
+            await self._close_context(pooled)
+            return
+        if pooled.browser.is_connected():
+            for page in list(pooled.context.pages):
+                try:
+                    await page.close()
+                except Exception as e:
+                    print(f"⚠️ Error closing leftover page: {e}")
+        self._idle.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Borrow a browser context for the duration of a scrape."""
+        if self._closed:
+            raise RuntimeError("Browser pool has been shut down.")
+        await self.start()
+        pooled = await self._idle.get()
+        try:
+            pooled = await self._ensure_healthy(pooled)
+        except Exception:
+            self._idle.put_nowait(pooled)
+            raise
+        if pooled.blocking_stats:
+            pooled.blocking_stats.reset()  # Counters cover this lease only
+        try:
+            yield pooled
+        finally:
+            await self._release(pooled)
+
+    async def shutdown(self):
+        """Close every context and browser, then stop Playwright."""
+        self._closed = True
+        if self._idle is not None:
+            while not self._idle.empty():
+                await self._close_context(self._idle.get_nowait())
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"⚠️ Error closing browser: {e}")
+        self._browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        print("🛑 Browser pool shut down.")
+
+
+# -------------------------------
+# Process-wide Pool & Event Loop
+# -------------------------------
+
+# Playwright objects are bound to the event loop that created them, while Django
+# (async_to_sync) and APScheduler (asyncio.run) create a fresh loop per call.
+# The pool therefore lives on its own loop in a background thread.
+_pool = None
+_loop = None
+_lock = threading.Lock()
+_shutdown_hooks = []
+
+
+def register_shutdown(hook):
+    """Register an async callable to run on the pool loop when the pool shuts down (e.g. closing HTTP clients)."""
+    if hook not in _shutdown_hooks:
+        _shutdown_hooks.append(hook)
+
+
+def _get_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="scraper-browser-pool", daemon=True).start()
+            atexit.register(shutdown_browser_pool)
+        return _loop
+
+
+def get_browser_pool():
+    """Return the process-wide browser pool, configured from settings."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                browsers=scraper_setting("SCRAPER_POOL_BROWSERS", 1),
+                contexts_per_browser=scraper_setting("SCRAPER_POOL_CONTEXTS_PER_BROWSER", 2),
+                max_pages_per_context=scraper_setting("SCRAPER_POOL_MAX_PAGES_PER_CONTEXT", 100),
+                headless=scraper_setting("SCRAPER_HEADLESS", False),
+                resource_blocker=build_resource_blocker(),
+            )
+        return _pool
+
+
+async def run_in_pool(coro):
+    """Await a coroutine on the pool's event loop, where the shared browsers live."""
+    loop = _get_loop()
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    if current is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def iterate_in_pool(agen):
+    """
+    Consume an async generator on the pool's event loop from synchronous code (e.g. a streaming
+    Django response), yielding its items as they arrive. Closing this generator early — say,
+    the client disconnected — cancels the async generator on the pool loop.
+    """
+    items = queue.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(("item", item))
+        except Exception as e:
+            items.put(("error", e))
+        finally:
+            items.put(("done", finished))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "done":
+                break
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        future.cancel()
+
+
+def shutdown_browser_pool(timeout=30):
+    """Shutdown hook: close the shared browsers and stop the pool loop."""
+    global _pool, _loop
+    with _lock:
+        pool, loop = _pool, _loop
+        _pool, _loop = None, None
+    if loop is None:
+        return
+    try:
+        for hook in _shutdown_hooks:
+            asyncio.run_coroutine_threadsafe(hook(), loop).result(timeout)
+        if pool is not None:
+            asyncio.run_coroutine_threadsafe(pool.shutdown(), loop).result(timeout)
+    except Exception as e:
+        print(f"❌ Error shutting down browser pool: {e}")
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
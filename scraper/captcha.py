@@ -0,0 +1,50 @@
+# captcha.py
+
+import os
+import tempfile
+from amazoncaptcha import AmazonCaptcha
+
+CAPTCHA_BOX_SELECTOR = "div.a-section > div.a-box > div.a-box-inner"
+
+
+async def solve_captcha(page, attempts=10):
+    """
+    Detect and solve the Amazon CAPTCHA on the given page.
+    Falls back to waiting for a manual solve in the browser after `attempts` failures.
+    Returns True if a CAPTCHA was shown, False if the page was clean.
+    """
+    for attempt in range(attempts):
+        if await page.is_visible(CAPTCHA_BOX_SELECTOR):
+            print(f"CAPTCHA detected, attempting to solve... (Attempt {attempt + 1}/{attempts})")
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_img:
+                captcha_path = temp_img.name
+                await page.locator("div.a-row.a-text-center img").screenshot(path=captcha_path)
+
+            try:
+                solver = AmazonCaptcha(captcha_path)
+                captcha_solution = solver.solve()
+                if len(captcha_solution) == 6:
+                    await page.fill("input#captchacharacters", captcha_solution.strip())
+                    await page.click("button[type='submit']")
+                    await page.wait_for_load_state('domcontentloaded')
+                    if not await page.is_visible(CAPTCHA_BOX_SELECTOR):
+                        print("CAPTCHA solved.")
+                        return True
+                else:
+                    print("Failed CAPTCHA solution attempt, retrying...")
+                    await page.locator("a:has-text('Try different image')").click()
+                    # ✅ Wait for the new image instead of a fixed delay
+                    await page.wait_for_load_state("domcontentloaded")
+                    await page.locator("div.a-row.a-text-center img").wait_for(state="visible")
+            finally:
+                os.remove(captcha_path)
+        else:
+            if attempt == 0:
+                print("No CAPTCHA detected.")
+                return False
+            return True
+
+    print("Manual CAPTCHA solving required. Please solve it in the browser...")
+    # ✅ Resume as soon as the CAPTCHA box disappears (no polling, no timeout)
+    await page.wait_for_selector(CAPTCHA_BOX_SELECTOR, state="hidden", timeout=0)
+    return True
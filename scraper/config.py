@@ -0,0 +1,14 @@
+# config.py
+
+import os
+from django.conf import settings
+
+
+def scraper_setting(name, default):
+    """
+    Read a SCRAPER_* value from Django settings.
+    Falls back to the default when Django isn't configured (standalone script runs).
+    """
+    if not settings.configured and not os.environ.get("DJANGO_SETTINGS_MODULE"):
+        return default
+    return getattr(settings, name, default)
@@ -0,0 +1,243 @@
+# html_parser.py
+
+import sys
+import copy
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from bs4 import BeautifulSoup
+
+# Pure-Python parsing of raw Amazon HTML into the same records the scrapers build.
+# No Django or Playwright imports here, so it can run in worker processes and be
+# benchmarked/re-run offline against saved pages.
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+SEARCH_CARD_SELECTOR = 'div.s-main-slot div[data-component-type="s-search-result"]'
+
+# The card's title link (never the image, review or "more buying choices" links)
+SEARCH_CARD_LINK_SELECTOR = "a.a-link-normal.s-line-clamp-2.s-link-style.a-text-normal, h2 a.a-link-normal"
+
+# Runs in the browser: collects the raw text of every card in a single round trip.
+# read_search_card collects the same raw fields from static HTML; both feed parse_search_card.
+SEARCH_CARDS_JS = """
+([selector, linkSelector]) => Array.from(document.querySelectorAll(selector)).map((card) => {
+    const text = (el) => (el ? el.textContent : null);
+    const h2 = card.querySelector("h2");
+    const spans = h2 ? Array.from(h2.querySelectorAll("span")).map((span) => span.textContent) : [];
+    const link = card.querySelector(linkSelector);
+    return {
+        asin: card.getAttribute("data-asin"),
+        has_title: !!h2,
+        aria_label: h2 ? h2.getAttribute("aria-label") : null,
+        title_spans: spans,
+        price: text(card.querySelector("span.a-price span.a-offscreen")),
+        rating: text(card.querySelector("span.a-icon-alt")),
+        reviews: text(card.querySelector("span.a-size-base.s-underline-text")),
+        href: link ? link.getAttribute("href") : null,
+    };
+})
+"""
+
+
+# -------------------------------
+# Field Normalization
+# -------------------------------
+
+def clean_price(price_text):
+    """Convert raw price text to Decimal."""
+    if not price_text:
+        return None
+    try:
+        return Decimal(price_text.replace("$", "").replace(",", "").strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def parse_search_card(raw_card):
+    """Turn the raw strings of one search result card into a product record."""
+    title = raw_card["aria_label"] if raw_card["has_title"] else "No title found"
+    if not title and raw_card["has_title"]:
+        spans = raw_card["title_spans"]
+        title = spans[1] if len(spans) > 1 else spans[0]
+    if title and title.startswith("Sponsored Ad -"):
+        title = title.replace("Sponsored Ad -", "").strip()
+
+    rating_text = raw_card["rating"]
+    reviews_text = raw_card["reviews"]
+    href = raw_card["href"]
+
+    return {
+        "asin": raw_card.get("asin") or None,
+        "title": title,
+        "price": clean_price(raw_card["price"]),
+        "rating": float(rating_text.split()[0]) if rating_text is not None else None,
+        "reviews": int(reviews_text.replace(",", "")) if reviews_text is not None else None,
+        "link": f"https://www.amazon.com{href}" if href is not None else None,
+    }
+
+
+def build_product_record(raw, url):
+    """Turn the raw strings of a product detail page into the refinement scraper's record."""
+    title = raw["title"] if raw["title"] is not None else "No title found"
+    price = raw["price"] if raw["price"] is not None else "Price not available"
+
+    price_numeric = None
+    if price != "Price not available":
+        try:
+            price_numeric = float(price.replace("$", "").replace(",", ""))
+        except ValueError:
+            price_numeric = None
+
+    rating = raw["rating"] if raw["rating"] is not None else "No rating found"
+    reviews = raw["reviews"] if raw["reviews"] is not None else "No reviews found"
+    availability = raw["availability"] if raw["availability"] is not None else "Availability not found"
+
+    return {
+        "title": title.strip(),
+        "price": price.strip(),
+        "price_numeric": price_numeric,
+        "rating": rating.strip(),
+        "reviews": reviews.strip(),
+        "availability": availability.strip(),
+        "url": url,
+    }
+
+
+def card_to_product_record(card):
+    """Express a search card in the refinement scraper's record format (availability isn't on cards)."""
+    price = card["price"]
+    return {
+        "title": card["title"],
+        "price": f"${price:,}" if price is not None else "Price not available",
+        "price_numeric": float(price) if price is not None else None,
+        "rating": f"{card['rating']} out of 5 stars" if card["rating"] is not None else "No rating found",
+        "reviews": f"{card['reviews']:,} ratings" if card["reviews"] is not None else "No reviews found",
+        "availability": "Unknown",
+        "url": card["link"],
+    }
+
+
+# -------------------------------
+# HTML Parsing
+# -------------------------------
+
+def _text(element):
+    return element.get_text() if element is not None else None
+
+
+def read_search_card(card):
+    """The raw strings of one search result card element — the fields SEARCH_CARDS_JS returns in the browser."""
+    h2 = card.select_one("h2")
+    link = card.select_one(SEARCH_CARD_LINK_SELECTOR)
+    return {
+        "asin": card.get("data-asin"),
+        "has_title": h2 is not None,
+        "aria_label": h2.get("aria-label") if h2 is not None else None,
+        "title_spans": [span.get_text() for span in h2.select("span")] if h2 is not None else [],
+        "price": _text(card.select_one("span.a-price span.a-offscreen")),
+        "rating": _text(card.select_one("span.a-icon-alt")),
+        "reviews": _text(card.select_one("span.a-size-base.s-underline-text")),
+        "href": link.get("href") if link is not None else None,
+    }
+
+
+def parse_search_results(html):
+    """Parse a search results page into card records (same fields as the live scraper)."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    cards = []
+    for card in soup.select(SEARCH_CARD_SELECTOR):
+        try:
+            cards.append(parse_search_card(read_search_card(card)))
+        except Exception as e:
+            print(f"Error extracting product details: {e}")
+    return cards
+
+
+def parse_product_page(html, url=None):
+    """Parse a product detail page into the refinement scraper's record."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    raw = {
+        "title": _text(soup.select_one("span#productTitle")),
+        "price": _text(soup.select_one("span.a-price > span.a-offscreen")),
+        "rating": _text(soup.select_one("span.a-icon-alt")),
+        "reviews": _text(soup.select_one("span#acrCustomerReviewText")),
+        "availability": _text(soup.select_one("div#availability span.a-size-medium.a-color-success")),
+    }
+    return build_product_record(raw, url)
+
+
+PARSERS = {
+    "search": parse_search_results,
+    "product": parse_product_page,
+}
+
+
+# -------------------------------
+# Caching & Process Pool
+# -------------------------------
+
+_CACHE_SIZE = 256
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_parse(kind, html, *args):
+    """
+    Parse with a small LRU cache keyed by the page's SHA-1 (and the parser's extra arguments),
+    so identical pages are parsed once. Safe to call from several threads; returns a copy
+    that callers may modify.
+    """
+    data = html.encode("utf-8") if isinstance(html, str) else html
+    key = (kind, hashlib.sha1(data).hexdigest(), args)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return copy.deepcopy(_cache[key])
+    result = PARSERS[kind](html, *args)
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return copy.deepcopy(result)
+
+
+def parse_many(documents, kind="product", processes=None):
+    """Parse many HTML documents of one kind, in a process pool when `processes` > 1."""
+    parser = PARSERS[kind]
+    if not processes or processes <= 1:
+        return [parser(html) for html in documents]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(parser, documents))
+
+
+# ✅ Benchmark / re-parse saved pages: python -m scraper.html_parser search|product FILE...
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in PARSERS:
+        print("Usage: python -m scraper.html_parser search|product FILE [FILE ...]")
+        sys.exit(1)
+
+    kind, paths = sys.argv[1], sys.argv[2:]
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+
+    print(f"Parser backend: {HTML_PARSER}")
+    for path, html in zip(paths, pages):
+        started = time.perf_counter()
+        result = PARSERS[kind](html)
+        elapsed = (time.perf_counter() - started) * 1000
+        count = len(result) if isinstance(result, list) else 1
+        print(f"  {path}: {count} record(s) in {elapsed:.1f} ms")
+
+    started = time.perf_counter()
+    parse_many(pages, kind, processes=4)
+    print(f"Process pool (4 workers): {len(pages)} page(s) in {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,150 @@
+# http_fetcher.py
+
+from collections import Counter
+import asyncio
+import httpx
+from scraper.amazon_urls import AMAZON_BASE_URL, build_search_url
+from scraper.browser_pool import CONTEXT_OPTIONS, register_shutdown
+from scraper.config import scraper_setting
+from scraper.html_parser import cached_parse
+from scraper.session_state import load_session_state
+
+# Lightweight fast path: fetch pages with a pooled async HTTP client and parse them
+# with html_parser. Callers fall back to the Playwright browser on a FastPathMiss.
+
+
+class FastPathMiss(Exception):
+    """The HTTP fast path could not serve this page (CAPTCHA, bad status, unparseable)."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class FastPathStats:
+    """Counters for fast-path hits and browser fallbacks (by reason)."""
+
+    def __init__(self):
+        self.hits = 0
+        self.fallbacks = Counter()
+
+    def record_hit(self):
+        self.hits += 1
+
+    def record_fallback(self, reason):
+        self.fallbacks[reason] += 1
+
+    @property
+    def fallback_rate(self):
+        total = self.hits + sum(self.fallbacks.values())
+        return sum(self.fallbacks.values()) / total if total else 0.0
+
+    def describe(self):
+        return (
+            f"HTTP fast path: {self.hits} hit(s), {sum(self.fallbacks.values())} fallback(s) "
+            f"({self.fallback_rate:.0%}) — {dict(self.fallbacks)}"
+        )
+
+
+FAST_PATH_STATS = FastPathStats()
+
+CAPTCHA_MARKERS = ("captchacharacters", "/errors/validateCaptcha")
+
+_client = None
+
+
+def fast_path_enabled():
+    return scraper_setting("SCRAPER_HTTP_FAST_PATH", True)
+
+
+def _base_url():
+    # Point this at a local stand-in server (serving saved pages) for testing
+    return scraper_setting("SCRAPER_HTTP_BASE_URL", AMAZON_BASE_URL).rstrip("/")
+
+
+def _rewrite(url):
+    base_url = _base_url()
+    if base_url != AMAZON_BASE_URL and url.startswith(AMAZON_BASE_URL):
+        return base_url + url[len(AMAZON_BASE_URL):]
+    return url
+
+
+def _session_cookies():
+    """Cookies from the stored browser session, so HTTP requests look like the same visitor."""
+    storage_state, _ = load_session_state()
+    cookies = httpx.Cookies()
+    for cookie in (storage_state or {}).get("cookies", []):
+        cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    return cookies
+
+
+def get_http_client():
+    """Return the shared keep-alive HTTP/2 client (created on first use, on the pool loop)."""
+    global _client
+    if _client is None:
+        headers = dict(CONTEXT_OPTIONS["extra_http_headers"])
+        headers["User-Agent"] = CONTEXT_OPTIONS["user_agent"]
+        _client = httpx.AsyncClient(
+            http2=True,
+            headers=headers,
+            cookies=_session_cookies(),
+            follow_redirects=True,
+            timeout=scraper_setting("SCRAPER_HTTP_TIMEOUT_SECONDS", 15),
+            limits=httpx.Limits(
+                max_connections=scraper_setting("SCRAPER_HTTP_MAX_CONNECTIONS", 10),
+                max_keepalive_connections=scraper_setting("SCRAPER_HTTP_MAX_CONNECTIONS", 10),
+            ),
+        )
+        register_shutdown(close_http_client)
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_html(url):
+    """GET a page and return its HTML, or raise FastPathMiss if it isn't usable."""
+    try:
+        response = await get_http_client().get(_rewrite(url))
+    except httpx.HTTPError as e:
+        raise FastPathMiss(f"http error: {type(e).__name__}")
+    if response.status_code != 200:
+        raise FastPathMiss(f"status {response.status_code}")
+    html = response.text
+    if any(marker in html for marker in CAPTCHA_MARKERS):
+        # Pick up the latest browser session cookies before the next attempt
+        get_http_client().cookies = _session_cookies()
+        raise FastPathMiss("captcha")
+    return html
+
+
+async def fetch_product_page(url):
+    """Fetch and parse a product page over HTTP (raises FastPathMiss → use the browser)."""
+    try:
+        html = await fetch_html(url)
+        product_data = await asyncio.to_thread(cached_parse, "product", html, url)
+        if product_data["title"] == "No title found":
+            raise FastPathMiss("unparseable product page")
+    except FastPathMiss as e:
+        FAST_PATH_STATS.record_fallback(e.reason)
+        raise
+    FAST_PATH_STATS.record_hit()
+    return product_data
+
+
+async def fetch_search_results(search_query):
+    """Fetch and parse the first search results page over HTTP (raises FastPathMiss → use the browser)."""
+    try:
+        html = await fetch_html(build_search_url(search_query))
+        cards = await asyncio.to_thread(cached_parse, "search", html)
+        if not cards:
+            raise FastPathMiss("unparseable search page")
+    except FastPathMiss as e:
+        FAST_PATH_STATS.record_fallback(e.reason)
+        raise
+    FAST_PATH_STATS.record_hit()
+    return cards
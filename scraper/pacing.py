@@ -0,0 +1,115 @@
+# pacing.py
+
+import time
+import random
+import asyncio
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from scraper.config import scraper_setting
+
+# Readiness is handled by selector/load-state waits in the scrapers; the only deliberate
+# idle time left is the human-like pacing below, so it can be tuned (or turned off) in one place.
+
+# (StageTimer, stage name) of the stage the current task is running in — tasks started
+# with asyncio.gather inherit it, so pauses deep inside helpers are still attributed.
+_current_stage = contextvars.ContextVar("scraper_current_stage", default=None)
+
+
+# -------------------------------
+# Per-stage Timing
+# -------------------------------
+
+class StageTimer:
+    """Wall-clock time per scrape stage, with the pacing idle time spent inside it."""
+
+    def __init__(self, label):
+        self.label = label
+        self.stages = OrderedDict()
+
+    def _entry(self, name):
+        return self.stages.setdefault(name, {"seconds": 0.0, "idle": 0.0, "sleep_removed": 0.0})
+
+    @contextmanager
+    def stage(self, name):
+        entry = self._entry(name)
+        token = _current_stage.set((self, name))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry["seconds"] += time.perf_counter() - started
+            _current_stage.reset(token)
+
+    def report(self):
+        print(f"\n⏱️ Stage timings — {self.label}:")
+        total = idle = removed = 0.0
+        for name, entry in self.stages.items():
+            print(
+                f"  {name:<18} {entry['seconds']:7.2f}s  (pacing idle {entry['idle']:5.2f}s, "
+                f"fixed sleeps removed ~{entry['sleep_removed']:5.2f}s)"
+            )
+            total += entry["seconds"]
+            idle += entry["idle"]
+            removed += entry["sleep_removed"]
+        print(f"  {'total':<18} {total:7.2f}s  (pacing idle {idle:5.2f}s, fixed sleeps removed ~{removed:5.2f}s)")
+
+
+def record_removed_sleep(seconds):
+    """Note where a fixed sleep used to be, so the stage report shows the idle time saved."""
+    current = _current_stage.get()
+    if current:
+        timer, name = current
+        timer._entry(name)["sleep_removed"] += seconds
+
+
+# -------------------------------
+# Rate Control
+# -------------------------------
+
+class RateController:
+    """
+    Human-like pacing between navigations: a random delay in [min_delay, max_delay]
+    plus an optional process-wide minimum interval between navigations.
+    """
+
+    def __init__(self, min_delay=0.5, max_delay=1.5, min_interval=0.0):
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.min_interval = min_interval
+        self._last_slot = 0.0
+
+    async def pause(self):
+        """Wait before the next navigation; returns the seconds waited."""
+        now = time.monotonic()
+        start_at = max(now + random.uniform(self.min_delay, self.max_delay), self._last_slot + self.min_interval)
+        self._last_slot = start_at
+        wait = start_at - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        current = _current_stage.get()
+        if current:
+            timer, name = current
+            timer._entry(name)["idle"] += wait
+        return wait
+
+
+_rate_controller = None
+
+
+def get_rate_controller():
+    """Process-wide rate controller, configured from SCRAPER_PACING_* settings."""
+    global _rate_controller
+    if _rate_controller is None:
+        _rate_controller = RateController(
+            min_delay=scraper_setting("SCRAPER_PACING_MIN_SECONDS", 0.5),
+            max_delay=scraper_setting("SCRAPER_PACING_MAX_SECONDS", 1.5),
+            min_interval=scraper_setting("SCRAPER_PACING_MIN_INTERVAL_SECONDS", 0.0),
+        )
+    return _rate_controller
+
+
+async def pace():
+    """Shortcut: pause on the process-wide rate controller."""
+    return await get_rate_controller().pause()
@@ -2,17 +2,22 @@
 
 import os
 import sys
-import random
-import tempfile
+import asyncio
 from datetime import timedelta
-from decimal import Decimal, InvalidOperation
 import django
 from asgiref.sync import sync_to_async
-from amazoncaptcha import AmazonCaptcha
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from django.utils import timezone
 from django.contrib.auth.models import User
-from playwright.async_api import async_playwright
 from base.models import TrackedProduct, PriceHistory
+from scraper.amazon_urls import build_product_url, build_search_url, extract_asin, normalize_query
+from scraper.browser_pool import get_browser_pool, run_in_pool
+from scraper.config import scraper_setting
+from scraper.pacing import StageTimer, pace, record_removed_sleep
+from scraper.result_store import get_result_store
+from scraper.search_cache import save_search_results
+from scraper.single_flight import get_search_flights
+from scraper.html_parser import SEARCH_CARD_LINK_SELECTOR, SEARCH_CARD_SELECTOR, SEARCH_CARDS_JS, parse_search_card
 
 # Django setup
 sys.path.append("..")
@@ -23,209 +28,407 @@ django.setup()
 # Utility Functions
 # -------------------------------
 
-def clean_price(price_text):
-    """Convert raw price text to Decimal."""
-    if not price_text:
+def log_error(message, exception):
+    """Print formatted error message."""
+    print(f"{message}: {exception}")
+
+async def report_progress(progress, **fields):
+    """Pass progress counters to the caller's async callback, if it gave one."""
+    if progress:
+        await progress(**fields)
+
+async def read_availability(page):
+    """Read the availability text from a product page, or None if it has no #availability block."""
+    availability_container = await page.query_selector("#availability")
+    if not availability_container:
         return None
+    in_stock = await availability_container.query_selector("span.a-size-medium.a-color-success")
+    warning = await availability_container.query_selector("span.a-size-base.a-color-price.a-text-bold")
+    if in_stock:
+        return await in_stock.text_content()
+    if warning:
+        return await warning.text_content()
+    return "Not available"
+
+# -------------------------------
+# Search Card Extraction
+# -------------------------------
+
+async def extract_cards(page):
+    """Parse every search result card on the current page (one page.evaluate round trip)."""
+    cards = []
+    raw_cards = await page.evaluate(SEARCH_CARDS_JS, [SEARCH_CARD_SELECTOR, SEARCH_CARD_LINK_SELECTOR])
+    for raw_card in raw_cards:
+        try:
+            card = parse_search_card(raw_card)
+            # Availability is filled in by its own stage once all cards are collected
+            card["availability"] = "Unknown"
+            cards.append(card)
+        except Exception as e:
+            log_error("Error extracting product details", e)
+    return cards
+
+# -------------------------------
+# Pagination
+# -------------------------------
+
+async def fetch_search_page(leased, search_query, page_number, page=None):
+    """Load one results page directly by URL in its own tab and return its cards ([] if it has none)."""
+    page = page or await leased.new_page()
+    try:
+        await pace()
+        await page.goto(build_search_url(search_query, page_number), wait_until="domcontentloaded")
+        await leased.handle_captcha(page)
+        try:
+            await page.wait_for_selector('div.s-main-slot', timeout=60000)
+        except Exception:
+            print(f"ℹ️ No results on page {page_number}.")
+            return []
+        return await extract_cards(page)
+    except Exception as e:
+        log_error(f"Error scraping product data on page {page_number}", e)
+        return []
+    finally:
+        await page.close()
+
+async def fetch_search_pages_parallel(leased, search_query, max_pages, first_page=None, progress=None):
+    """
+    Fetch results pages 1..max_pages concurrently (bounded by SCRAPER_PAGINATION_CONCURRENCY),
+    then merge them in page order, dropping products already seen on an earlier page (by ASIN).
+    """
+    concurrency = max(1, scraper_setting("SCRAPER_PAGINATION_CONCURRENCY", 5))
+    semaphore = asyncio.Semaphore(concurrency)
+    done = {"pages": 0, "products": 0}
+
+    async def fetch_with_limit(page_number):
+        async with semaphore:
+            cards = await fetch_search_page(leased, search_query, page_number, first_page if page_number == 1 else None)
+        done["pages"] += 1
+        done["products"] += len(cards)
+        await report_progress(progress, pages_done=done["pages"], products_found=done["products"])
+        return cards
+
+    print(f"📄 Fetching {max_pages} result page(s) in parallel (concurrency: {concurrency})...")
+    pages = await asyncio.gather(*(fetch_with_limit(n) for n in range(1, max_pages + 1)))
+
+    merged, seen = [], set()
+    for cards in pages:
+        for card in cards:
+            key = card["asin"] or card["link"]
+            if key is not None:
+                # Cards with neither an ASIN nor a link can't be matched up, so they are all kept
+                if key in seen:
+                    continue
+                seen.add(key)
+            merged.append(card)
+    return merged
+
+async def scrape_pages_sequentially(leased, page, search_query, depth, single_page, progress=None):
+    """Search from the current page and follow the 'next' button up to `depth` pages (None if the search failed)."""
+    # --- Perform search ---
     try:
-        return Decimal(price_text.replace("$", "").replace(",", "").strip())
-    except (InvalidOperation, ValueError):
+        if leased.warmed_up:
+            # ✅ Valid stored session: go straight to the results page
+            await pace()
+            await page.goto(build_search_url(search_query), wait_until="domcontentloaded")
+            await leased.handle_captcha(page)
+        else:
+            # --- Homepage warm-up & CAPTCHA, then type the query ---
+            await leased.warm_up(page)
+            await pace()
+            await page.fill('input[name="field-keywords"]', search_query)
+            await page.press('input[name="field-keywords"]', "Enter")
+            # Results readiness is awaited below via div.s-main-slot (was a 3–6 s sleep)
+            record_removed_sleep(4.5)
+    except Exception as e:
+        log_error("Error accessing search bar", e)
         return None
 
-def log_error(message, exception):
-    """Print formatted error message."""
-    print(f"{message}: {exception}")
+    # --- Scrape product results ---
+    scraped_products = []
+    current_page = 1
+    max_pages = depth  # ✅ use passed-in depth instead of fixed 3
+
+    while current_page <= max_pages:
+        try:
+            await page.wait_for_selector('div.s-main-slot', timeout=60000)
+            record_removed_sleep(3.5)  # Was a 2–5 s sleep after the results appeared
+            scraped_products.extend(await extract_cards(page))
+            await report_progress(progress, pages_done=current_page, products_found=len(scraped_products))
+
+            # ✅ Handle next-page logic with depth limit
+            next_button = await page.query_selector("a.s-pagination-item.s-pagination-next")
+            if not next_button or single_page:
+                break
+            next_page_url = await next_button.get_attribute("href")
+            if not next_page_url:
+                break  # ⛔ stop if no valid href found
+            await pace()
+            await page.goto(f"https://www.amazon.com{next_page_url}", wait_until="domcontentloaded")
+            current_page += 1
+
+        except Exception as e:
+            log_error(f"Error scraping product data on page {current_page}", e)
+            break
+
+    return scraped_products
+
+# -------------------------------
+# Availability Enrichment
+# -------------------------------
+
+async def lookup_availability(leased, product_link):
+    """Open a product page in its own tab and return its availability ('Unknown' on failure)."""
+    detail_page = await leased.new_page()
+    try:
+        await pace()
+        await detail_page.goto(product_link, wait_until="domcontentloaded")
+        # ✅ Wait for the availability block itself (was a fixed 1.5 s sleep)
+        try:
+            await detail_page.wait_for_selector("#availability", timeout=5000)
+        except PlaywrightTimeoutError:
+            pass
+        record_removed_sleep(1.5)
+        return await read_availability(detail_page) or "Unknown"
+    except Exception as e:
+        log_error("Availability scrape failed", e)
+        return "Unknown"
+    finally:
+        await detail_page.close()
+
+async def enrich_availability(leased, scraped_products, concurrency=None):
+    """Fill in availability for scraped cards, running at most `concurrency` product pages at once."""
+    concurrency = max(1, concurrency or scraper_setting("SCRAPER_AVAILABILITY_CONCURRENCY", 4))
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = [product for product in scraped_products if product["link"]]
+
+    async def worker(product):
+        async with semaphore:
+            product["availability"] = await lookup_availability(leased, product["link"])
+
+    print(f"🔎 Looking up availability for {len(pending)} products (workers: {concurrency})...")
+    await asyncio.gather(*(worker(product) for product in pending))
+
+async def fetch_availability(product_link):
+    """Resolve availability for a single product on demand (used for deferred lookups)."""
+    async def _fetch():
+        async with get_browser_pool().lease() as leased:
+            return await lookup_availability(leased, product_link)
+    return await run_in_pool(_fetch())
 
 # -------------------------------
 # Main Scraper
 # -------------------------------
 
-# Temp in-memory store per user (for frontend to fetch scraped results)
-TEMP_SCRAPE_RESULTS = {}
+AVAILABILITY_MODES = ("concurrent", "deferred", "skip")
+PAGINATION_MODES = ("parallel", "sequential")
 
-async def scrape_amazon(search_query, user_id=None, depth=3, single_page=False, scheduled_scraping=False):
+
+async def scrape_amazon(search_query, user_id=None, depth=3, single_page=False, scheduled_scraping=False, availability_mode=None, pagination_mode=None, progress=None):
     """
     Scrape Amazon search results for a given query.
-    Stores the results temporarily per user for later selection.
+    Stores the results temporarily per user for later selection, and returns them.
+    Runs on the shared browser pool's event loop.
+
+    progress: optional async callback, awaited with pages_done/products_found as pages complete.
+
+    availability_mode (defaults to SCRAPER_AVAILABILITY_MODE):
+      - "concurrent": look up availability for all cards in parallel after the search pages are read
+      - "deferred":   leave availability 'Unknown' and resolve it when the user picks a product
+      - "skip":       never look availability up
+
+    pagination_mode (defaults to SCRAPER_PAGINATION_MODE):
+      - "parallel":   open /s?k=...&page=1..depth directly in concurrent tabs, deduplicated by ASIN
+      - "sequential": type the query and follow the 'next' button page by page
     """
+    availability_mode = availability_mode or scraper_setting("SCRAPER_AVAILABILITY_MODE", "concurrent")
+    if availability_mode not in AVAILABILITY_MODES:
+        raise ValueError(f"Unknown availability mode '{availability_mode}'.")
+    pagination_mode = pagination_mode or scraper_setting("SCRAPER_PAGINATION_MODE", "parallel")
+    if pagination_mode not in PAGINATION_MODES:
+        raise ValueError(f"Unknown pagination mode '{pagination_mode}'.")
+    return await run_in_pool(_scrape_amazon(
+        search_query, user_id, depth, single_page, scheduled_scraping, availability_mode, pagination_mode, progress
+    ))
+
+
+async def _scrape_amazon(search_query, user_id, depth, single_page, scheduled_scraping, availability_mode, pagination_mode, progress):
     if not user_id:
         raise ValueError("User ID is required for scraping.")
 
     user = await sync_to_async(User.objects.get)(id=user_id)
     print(f"Scraping Amazon for user: {user.username} (ID: {user.id}) — Depth: {depth}")
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
-            extra_http_headers={
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.5",
-                "Connection": "keep-alive",
-                "DNT": "1",
-                "Upgrade-Insecure-Requests": "1"
-            },
-            locale="en-US",
-            geolocation={"latitude": 37.7749, "longitude": -122.4194},
-            timezone_id="America/Los_Angeles"
-        )
-
-        await context.add_cookies([
-            {"name": "session-id", "value": "133-1234567-1234567", "domain": ".amazon.com", "path": "/"},
-            {"name": "session-id-time", "value": "2082787201l", "domain": ".amazon.com", "path": "/"},
-            {"name": "ubid-main", "value": "133-1234567-1234567", "domain": ".amazon.com", "path": "/"},
-            {"name": "x-main", "value": "x-main-cookie-value", "domain": ".amazon.com", "path": "/"}
-        ])
+    # ✅ Identical concurrent searches share one scrape; each caller gets its own copy of the results
+    flight_key = (normalize_query(search_query), 1 if single_page else depth, availability_mode, pagination_mode)
+    flights = get_search_flights()
+    scraped_products = await flights.run(
+        flight_key,
+        lambda shared_progress: collect_search_products(
+            search_query, depth, single_page, availability_mode, pagination_mode, shared_progress
+        ),
+        progress,
+    )
+    print(f"🔗 {flights.describe()}")
+    if scraped_products is None:
+        return
+    await report_progress(progress, products_found=len(scraped_products))
+
+    if scheduled_scraping:
+        return scraped_products
 
+    # ✅ Store results for manual selection (frontend), shared across worker processes
+    await sync_to_async(get_result_store().set)(user.id, {
+        "results": scraped_products,
+        "timestamp": timezone.now(),
+        "availability_mode": availability_mode,
+    })
+    print(f"✅ {len(scraped_products)} products scraped and stored for user {user.username}")
+
+    # ✅ Print each product to terminal
+    for i, p in enumerate(scraped_products, start=1):
+        print(f"{i}. {p['title']} — ${p['price']} — {p['availability']}")
+
+    return scraped_products
+
+
+async def collect_search_products(search_query, depth, single_page, availability_mode, pagination_mode, progress=None):
+    """Run one search in a leased browser context and return its products (None if the search failed)."""
+    async with get_browser_pool().lease() as leased:
+        context = leased.context
         context.set_default_navigation_timeout(30000)
         context.set_default_timeout(30000)
-        page = await context.new_page()
-
-        await page.goto("https://www.amazon.com")
-        await page.wait_for_timeout(random.uniform(2000, 5000))
-
-        # --- CAPTCHA Handling (same logic) ---
-        for attempt in range(10):
-            if await page.is_visible("div.a-section > div.a-box > div.a-box-inner"):
-                print(f"CAPTCHA detected, attempting to solve... (Attempt {attempt + 1}/10)")
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_img:
-                    captcha_path = temp_img.name
-                    await page.locator("div.a-row.a-text-center img").screenshot(path=captcha_path)
-
-                try:
-                    solver = AmazonCaptcha(captcha_path)
-                    captcha_solution = solver.solve()
-                    if len(captcha_solution) == 6:
-                        await page.fill("input#captchacharacters", captcha_solution.strip())
-                        await page.click("button[type='submit']")
-                        await page.wait_for_load_state('networkidle')
-                        if not await page.is_visible("div.a-section > div.a-box > div.a-box-inner"):
-                            print("CAPTCHA solved.")
-                            break
-                    else:
-                        print("Failed CAPTCHA solution attempt, retrying...")
-                        await page.locator("a:has-text('Try different image')").click()
-                        await page.wait_for_timeout(2000)
-                finally:
-                    os.remove(captcha_path)
-            else:
-                print("No CAPTCHA detected.")
-                break
+        page = await leased.new_page()
+        timer = StageTimer(f"search '{search_query}'")
+
+        if pagination_mode == "parallel":
+            # --- Direct /s?k=...&page=N navigation, all pages at once ---
+            if not leased.warmed_up:
+                with timer.stage("session"):
+                    await leased.warm_up(page)
+            with timer.stage("search pages"):
+                scraped_products = await fetch_search_pages_parallel(leased, search_query, 1 if single_page else depth, first_page=page, progress=progress)
+        else:
+            with timer.stage("search pages"):
+                scraped_products = await scrape_pages_sequentially(leased, page, search_query, depth, single_page, progress)
+            if scraped_products is None:
+                return None
+
+        # --- Availability enrichment stage ---
+        if availability_mode == "concurrent":
+            with timer.stage("availability"):
+                await enrich_availability(leased, scraped_products)
         else:
-            print("Manual CAPTCHA solving required. Please solve it in the browser...")
-            while await page.is_visible("div.a-section > div.a-box > div.a-box-inner"):
-                await page.wait_for_timeout(1000)
+            print(f"ℹ️ Availability lookups {availability_mode} — {len(scraped_products)} products left as 'Unknown'.")
 
-        # --- Perform search ---
-        try:
-            await page.fill('input[name="field-keywords"]', search_query)
-            await page.press('input[name="field-keywords"]', "Enter")
-            await page.wait_for_timeout(random.uniform(3000, 6000))
-        except Exception as e:
-            log_error("Error accessing search bar", e)
-            await browser.close()
-            return
+        timer.report()
+        if leased.describe_blocking():
+            print(f"🧱 {leased.describe_blocking()}")
 
-        # --- Scrape product results ---
-        scraped_products = []
-        current_page = 1
-        max_pages = depth  # ✅ use passed-in depth instead of fixed 3
-        product_counter = 0
+    # ✅ Keep a persistent record of this search (also what /search/ answers repeats from)
+    await persist_search_results(search_query, 1 if single_page else depth, scraped_products)
+    return scraped_products
 
-        while current_page <= max_pages:
-            try:
-                await page.wait_for_selector('div.s-main-slot', timeout=60000)
-                await page.wait_for_timeout(random.uniform(2000, 5000))
-                products = await page.query_selector_all('div.s-main-slot div[data-component-type="s-search-result"]')
 
-                for product in products:
-                    try:
-                        title_element = await product.query_selector("h2")
-                        title = await title_element.get_attribute("aria-label") if title_element else "No title found"
-                        if not title and title_element:
-                            span_elements = await title_element.query_selector_all("span")
-                            title = await span_elements[1].text_content() if len(span_elements) > 1 else await span_elements[0].text_content()
-                        if title and title.startswith("Sponsored Ad -"):
-                            title = title.replace("Sponsored Ad -", "").strip()
-
-                        price_element = await product.query_selector("span.a-price span.a-offscreen")
-                        price_text = await price_element.text_content() if price_element else None
-                        price_numeric = clean_price(price_text)
-
-                        rating_element = await product.query_selector("span.a-icon-alt")
-                        rating = float((await rating_element.text_content()).split()[0]) if rating_element else None
-
-                        reviews_element = await product.query_selector("span.a-size-base.s-underline-text")
-                        reviews = int((await reviews_element.text_content()).replace(",", "")) if reviews_element else None
-
-                        link_element = await product.query_selector("a.a-link-normal")
-                        product_link = f"https://www.amazon.com{await link_element.get_attribute('href')}" if link_element else None
-
-                        # ✅ Fetch availability from product page
-                        availability = "Unknown"
-                        if product_link:
-                            try:
-                                detail_page = await context.new_page()
-                                await detail_page.goto(product_link)
-                                await detail_page.wait_for_timeout(1500)
-                                availability_container = await detail_page.query_selector("#availability")
-                                if availability_container:
-                                    in_stock = await availability_container.query_selector("span.a-size-medium.a-color-success")
-                                    warning = await availability_container.query_selector("span.a-size-base.a-color-price.a-text-bold")
-                                    if in_stock:
-                                        availability = await in_stock.text_content()
-                                    elif warning:
-                                        availability = await warning.text_content()
-                                    else:
-                                        availability = "Not available"
-                                await detail_page.close()
-                            except Exception as e:
-                                log_error("Availability scrape failed", e)
-
-                        scraped_products.append({
-                            "title": title,
-                            "price": price_numeric,
-                            "rating": rating,
-                            "reviews": reviews,
-                            "link": product_link,
-                            "availability": availability,
-                        })
-                        product_counter += 1
+async def persist_search_results(search_query, depth, products):
+    """
+    Save a finished search to SearchResult. A database error is logged, not raised: the scrape
+    itself succeeded and its products are still returned (to every coalesced caller).
+    """
+    try:
+        saved = await sync_to_async(save_search_results)(search_query, depth, products)
+        print(f"🗄️ Saved {saved} search results for '{search_query}'.")
+    except Exception as e:
+        log_error(f"⚠️ Could not save search results for '{search_query}'", e)
 
-                    except Exception as e:
-                        log_error("Error extracting product details", e)
-                        continue
 
-                # ✅ Handle next-page logic with depth limit
-                next_button = await page.query_selector("a.s-pagination-item.s-pagination-next")
-                if not next_button or single_page:
-                    break
-                next_page_url = await next_button.get_attribute("href")
-                if not next_page_url:
-                    break  # ⛔ stop if no valid href found
-                await page.goto(f"https://www.amazon.com{next_page_url}")
-                current_page += 1
-
-            except Exception as e:
-                log_error(f"Error scraping product data on page {current_page}", e)
-                break
+# -------------------------------
+# Streaming Scraper
+# -------------------------------
 
-        await browser.close()
+async def stream_scrape_amazon(search_query, user_id=None, depth=3, single_page=False, availability_mode=None):
+    """
+    Async generator version of scrape_amazon: yields each product as soon as it is ready instead of
+    after the whole search. Result pages are opened directly (/s?k=...&page=N) in parallel, and with
+    "concurrent" availability each card is yielded once its own lookup finishes, so products arrive
+    in completion order (deduplicated by ASIN). The yielded products are saved to the result store,
+    in yield order, once the stream ends or stops, so ?index=N selection still works.
 
-        if scheduled_scraping:
-            return scraped_products
+    Runs on the browser pool's loop — consume it from sync code with browser_pool.iterate_in_pool.
+    """
+    availability_mode = availability_mode or scraper_setting("SCRAPER_AVAILABILITY_MODE", "concurrent")
+    if availability_mode not in AVAILABILITY_MODES:
+        raise ValueError(f"Unknown availability mode '{availability_mode}'.")
+    if not user_id:
+        raise ValueError("User ID is required for scraping.")
+
+    user = await sync_to_async(User.objects.get)(id=user_id)
+    print(f"Streaming Amazon search for user: {user.username} (ID: {user.id}) — Depth: {depth}")
 
-        # ✅ Store results for manual selection (frontend)
-        TEMP_SCRAPE_RESULTS[user.id] = {
-            "results": scraped_products,
-            "timestamp": timezone.now()
-        }
-        print(f"✅ {len(scraped_products)} products scraped and stored for user {user.username}")
+    results = []
+    entry = {"results": results, "timestamp": timezone.now(), "availability_mode": availability_mode}
+    store_entry = sync_to_async(get_result_store().set)
+    await store_entry(user.id, entry)  # Replace the previous search's results right away
+
+    async with get_browser_pool().lease() as leased:
+        context = leased.context
+        context.set_default_navigation_timeout(30000)
+        context.set_default_timeout(30000)
+        first_page = await leased.new_page()
+        if not leased.warmed_up:
+            await leased.warm_up(first_page)
+
+        ready = asyncio.Queue()
+        finished = object()
+        page_semaphore = asyncio.Semaphore(max(1, scraper_setting("SCRAPER_PAGINATION_CONCURRENCY", 5)))
+        availability_semaphore = asyncio.Semaphore(max(1, scraper_setting("SCRAPER_AVAILABILITY_CONCURRENCY", 4)))
+        seen = set()
+        lookups = []
+
+        async def resolve(card):
+            if availability_mode == "concurrent" and card["link"]:
+                async with availability_semaphore:
+                    card["availability"] = await lookup_availability(leased, card["link"])
+            await ready.put(card)
+
+        async def fetch(page_number):
+            async with page_semaphore:
+                cards = await fetch_search_page(leased, search_query, page_number, first_page if page_number == 1 else None)
+            for card in cards:
+                key = card["asin"] or card["link"]
+                if key is not None:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                lookups.append(asyncio.create_task(resolve(card)))
 
-        # ✅ Print each product to terminal
-        for i, p in enumerate(scraped_products, start=1):
-            print(f"{i}. {p['title']} — ${p['price']} — {p['availability']}")
+        async def drive():
+            try:
+                await asyncio.gather(*(fetch(n) for n in range(1, (1 if single_page else depth) + 1)))
+                await asyncio.gather(*lookups)
+            finally:
+                await ready.put(finished)
 
+        driver = asyncio.create_task(drive())
+        try:
+            while True:
+                product = await ready.get()
+                if product is finished:
+                    break
+                results.append(product)
+                yield product
+            await driver  # Surface a failure in the scrape itself
+            print(f"✅ {len(results)} products streamed and stored for user {user.username}")
+            await persist_search_results(search_query, 1 if single_page else depth, results)
+        finally:
+            # Consumer went away (or the scrape failed): stop the remaining pages and lookups
+            driver.cancel()
+            for task in lookups:
+                task.cancel()
+            # Stored once at the end: the cache backend pickles the whole list on every set()
+            await store_entry(user.id, entry)
+            if leased.describe_blocking():
+                print(f"🧱 {leased.describe_blocking()}")
 
 
 # -------------------------------
@@ -262,25 +465,15 @@ async def select_product_for_tracking(tracked_products, context, user_id=None):
                     try:
                         product_page = await context.new_page()
                         await product_page.goto(product_link)
-                        availability_container = await product_page.query_selector("#availability")
-
-                        if availability_container:
-                            in_stock = await availability_container.query_selector("span.a-size-medium.a-color-success")
-                            warning = await availability_container.query_selector("span.a-size-base.a-color-price.a-text-bold")
-                            if in_stock:
-                                availability = await in_stock.text_content()
-                            elif warning:
-                                availability = await warning.text_content()
-                            else:
-                                availability = "Not available"
-                        else:
-                            availability = "No availability info"
+                        availability = await read_availability(product_page) or "No availability info"
                     except Exception as e:
                         log_error("Error fetching availability", e)
                     finally:
                         await product_page.close()
 
-                # Save product to DB
+                # Save product to DB (with its ASIN, so re-scrapes can go straight to /dp/<ASIN>)
+                asin = product_data.get("asin") or extract_asin(product_link)
+                canonical_url = build_product_url(asin) if asin else product_link
                 current_time = (timezone.now() + timedelta(hours=2)).replace(microsecond=0)
 
                 existing_qs = await sync_to_async(TrackedProduct.objects.filter)(
@@ -294,6 +487,8 @@ async def select_product_for_tracking(tracked_products, context, user_id=None):
                     tracked_product.reviews = product_data["reviews"]
                     tracked_product.availability = availability
                     tracked_product.date_scraped = current_time
+                    tracked_product.asin = asin or tracked_product.asin
+                    tracked_product.product_url = canonical_url or tracked_product.product_url
                     await sync_to_async(tracked_product.save)()
                     print(f"🔄 Updated: {product_data['title']} — Availability: {availability}")
                 else:
@@ -305,6 +500,8 @@ async def select_product_for_tracking(tracked_products, context, user_id=None):
                         availability=availability,
                         date_scraped=current_time,
                         user=user,
+                        asin=asin,
+                        product_url=canonical_url,
                     )
                     print(f"🆕 New tracked: {product_data['title']} — Availability: {availability}")
 
@@ -332,7 +529,6 @@ async def select_product_for_tracking(tracked_products, context, user_id=None):
 # -------------------------------
 
 if __name__ == "__main__":
-    import asyncio
     search_query = input("Enter your search query: ")
     asyncio.run(scrape_amazon(search_query))
 
@@ -1,161 +1,108 @@
 import os
-import random
-import tempfile
-from playwright.async_api import async_playwright
-from amazoncaptcha import AmazonCaptcha
+import time
 import asyncio
+import hashlib
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from scraper.amazon_urls import build_product_url, build_search_url
+from scraper.browser_pool import get_browser_pool, run_in_pool
+from scraper.config import scraper_setting
+from scraper.pacing import StageTimer, pace, record_removed_sleep
+from scraper.html_parser import SEARCH_CARD_LINK_SELECTOR, SEARCH_CARD_SELECTOR, SEARCH_CARDS_JS, cached_parse, parse_search_card
+from scraper.http_fetcher import (
+    FAST_PATH_STATS, FastPathMiss, fast_path_enabled, fetch_product_page, fetch_search_results
+)
+
+
+async def scrape_amazon(search_query, persist_browser=False, detail_concurrency=None):
+    """
+    Scrape Amazon using a dynamic search query, extract product URLs, and extract data from all product pages.
+    Product pages are fetched in parallel tabs, at most `detail_concurrency` at a time
+    (defaults to SCRAPER_DETAIL_CONCURRENCY; pass 1 for the old one-by-one behaviour).
+    """
+    return await run_in_pool(_scrape_amazon(search_query, detail_concurrency))
+
+
+async def scrape_search_cards(search_query):
+    """
+    Return only the search result cards for a query (title, price, rating, reviews, link, ASIN),
+    without opening any product page. Used for card-level matching in run_scraping.
+    """
+    return await run_in_pool(_scrape_search_cards(search_query))
+
+
+async def _scrape_search_cards(search_query):
+    try:
+        async with get_browser_pool().lease() as leased:
+            leased.context.set_default_navigation_timeout(60000)
+            leased.context.set_default_timeout(60000)
+            return await collect_search_cards(leased, search_query)
+    except Exception as e:
+        print(f"❌ Error scraping search cards: {e}")
+
+
+async def scrape_product(asin=None, product_url=None):
+    """Re-scrape a single known product straight from its page (/dp/<ASIN> or a given URL) — no search, no matching."""
+    return await run_in_pool(_scrape_product(product_url or build_product_url(asin)))
+
+
+async def _scrape_product(product_url):
+    try:
+        async with get_browser_pool().lease() as leased:
+            leased.context.set_default_navigation_timeout(60000)
+            leased.context.set_default_timeout(60000)
+            product_data, seconds, error = await extract_product_page(leased, 0, 1, product_url)
+            print(f"⏱️ {product_url} — {seconds:.2f}s — {'ok' if product_data else f'FAILED ({error})'}")
+            return product_data
+    except Exception as e:
+        print(f"❌ Error scraping product {product_url}: {e}")
 
 
-async def scrape_amazon(search_query, persist_browser=False):
-    """Scrape Amazon using a dynamic search query, extract product URLs, and extract data from all product pages."""
-    browser = None
+async def _scrape_amazon(search_query, detail_concurrency):
     try:
         print("Starting hard-coded scraping process...")
 
-        # Launch the browser
-        print("Launching the browser...")
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False)  # Visible browser
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
-                extra_http_headers={
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                    "Accept-Language": "en-US,en;q=0.5",
-                    "Connection": "keep-alive",
-                    "DNT": "1",
-                    "Upgrade-Insecure-Requests": "1",
-                },
-                locale="en-US",
-                geolocation={"latitude": 37.7749, "longitude": -122.4194},
-                timezone_id="America/Los_Angeles",
-            )
-
-            # Add cookies for session persistence
-            print("Adding cookies...")
-            await context.add_cookies([
-                {"name": "session-id", "value": "133-1234567-1234567", "domain": ".amazon.com", "path": "/"},
-                {"name": "session-id-time", "value": "2082787201l", "domain": ".amazon.com", "path": "/"},
-                {"name": "ubid-main", "value": "133-1234567-1234567", "domain": ".amazon.com", "path": "/"},
-                {"name": "x-main", "value": "x-main-cookie-value", "domain": ".amazon.com", "path": "/"},
-            ])
+        # Lease a context from the shared browser pool
+        print("Leasing a browser context from the pool...")
+        async with get_browser_pool().lease() as leased:
+            context = leased.context
 
             # Set timeouts
             context.set_default_navigation_timeout(60000)
             context.set_default_timeout(60000)
 
-            # Create a new page
-            page = await context.new_page()
-
-            # Navigate to Amazon homepage
-            print("Navigating to Amazon homepage...")
-            await page.goto("https://www.amazon.com", timeout=100000)
-            await page.wait_for_timeout(random.uniform(5000, 10000))
-
-            # Check for and handle CAPTCHA
-            for attempt in range(10):
-                if await page.is_visible("div.a-section > div.a-box > div.a-box-inner"):
-                    print(f"CAPTCHA detected, attempting to solve... (Attempt {attempt + 1}/10)")
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_img:
-                        captcha_image_path = temp_img.name
-                        await page.locator("div.a-row.a-text-center img").screenshot(path=captcha_image_path)
-                    try:
-                        solver = AmazonCaptcha(captcha_image_path)
-                        captcha_solution = solver.solve()
-                        if len(captcha_solution) == 6:
-                            await page.fill("input#captchacharacters", captcha_solution.strip())
-                            await page.click("button[type='submit']")
-                            await page.wait_for_load_state('networkidle')
-                            if not await page.is_visible("div.a-section > div.a-box > div.a-box-inner"):
-                                print("CAPTCHA solved.")
-                                break
-                        else:
-                            print("Failed CAPTCHA solution attempt, trying a new image.")
-                            await page.locator("a:has-text('Try different image')").click()
-                            await page.wait_for_timeout(4000)
-                    finally:
-                        os.remove(captcha_image_path)
-                else:
-                    print("No CAPTCHA detected.")
-                    break
-            else:
-                print("Manual CAPTCHA solving required. Please solve it in the browser.")
-                while await page.is_visible("div.a-section > div.a-box > div.a-box-inner"):
-                    await page.wait_for_timeout(2000)
-
-            # Perform the search
-            print(f"Searching for: {search_query}")
-            search_bar_selector = 'input#twotabsearchtextbox'
-            await page.fill(search_bar_selector, search_query)
-            await page.press(search_bar_selector, "Enter")
-
-            # Wait for results
-            print("Waiting for search results...")
-            await page.wait_for_timeout(10000)
-            await page.wait_for_selector('div.s-main-slot', timeout=180000)
-
-            # Extract product URLs
-            products = await page.query_selector_all('div.s-main-slot div[data-component-type="s-search-result"]')
-            print(f"Found {len(products)} products.")
-            product_urls = []
-            for product in products:
-                url_element = await product.query_selector("a.a-link-normal.s-line-clamp-2.s-link-style.a-text-normal")
-                product_url = await url_element.get_attribute("href") if url_element else None
-                if product_url:
-                    product_urls.append(f"https://www.amazon.com{product_url}")
+            timer = StageTimer(f"refinement '{search_query}'")
+
+            # Step 1: Collect product URLs (HTTP fast path first, browser as fallback)
+            with timer.stage("search"):
+                cards = await collect_search_cards(leased, search_query)
+            product_urls = [card["link"] for card in cards if card["link"]]
 
             print("\nExtracted Product URLs:")
             for idx, url in enumerate(product_urls, start=1):
                 print(f"{idx}. {url}")
 
-            # Step 2: Extract product data
-            products_data = []
-            for idx, product_url in enumerate(product_urls):
-                print(f"\nNavigating to product page {idx + 1}/{len(product_urls)}: {product_url}")
-                product_page = await context.new_page()
-                try:
-                    await product_page.goto(product_url, timeout=60000)
-
-                    title_element = await product_page.query_selector("span#productTitle")
-                    title = await title_element.text_content() if title_element else "No title found"
-
-                    price_element = await product_page.query_selector("span.a-price > span.a-offscreen")
-                    price = await price_element.text_content() if price_element else "Price not available"
-
-                    price_numeric = None
-                    if price != "Price not available":
-                        try:
-                            price_numeric = float(price.replace("$", "").replace(",", ""))
-                        except ValueError:
-                            price_numeric = None
-
-                    rating_element = await product_page.query_selector("span.a-icon-alt")
-                    rating = await rating_element.text_content() if rating_element else "No rating found"
-
-                    reviews_element = await product_page.query_selector("span#acrCustomerReviewText")
-                    reviews = await reviews_element.text_content() if reviews_element else "No reviews found"
-
-                    availability_element = await product_page.query_selector("div#availability span.a-size-medium.a-color-success")
-                    availability = await availability_element.text_content() if availability_element else "Availability not found"
-
-                    product_data = {
-                        "title": title.strip(),
-                        "price": price.strip(),
-                        "price_numeric": price_numeric,
-                        "rating": rating.strip(),
-                        "reviews": reviews.strip(),
-                        "availability": availability.strip(),
-                        "url": product_url,
-                    }
-                    products_data.append(product_data)
-
-                    print("\nExtracted Data:")
-                    for key, value in product_data.items():
-                        print(f"  {key.capitalize()}: {value}")
-
-                except Exception as e:
-                    print(f"⚠️ Error extracting product {idx + 1}: {e}")
-                finally:
-                    await product_page.close()
+            # Step 2: Extract product data (product pages open in parallel tabs, bounded by the semaphore)
+            concurrency = max(1, detail_concurrency or scraper_setting("SCRAPER_DETAIL_CONCURRENCY", 4))
+            semaphore = asyncio.Semaphore(concurrency)
+            print(f"\nFetching {len(product_urls)} product pages (concurrency: {concurrency})...")
+
+            async def fetch_with_limit(idx, product_url):
+                async with semaphore:
+                    return await extract_product_page(leased, idx, len(product_urls), product_url)
+
+            started = time.perf_counter()
+            with timer.stage("product pages"):
+                fetched = await asyncio.gather(*(fetch_with_limit(idx, url) for idx, url in enumerate(product_urls)))
+            elapsed = time.perf_counter() - started
+
+            # gather() keeps input order, so results stay in search-result order
+            products_data = [product_data for product_data, _, _ in fetched if product_data]
+            print_detail_report(product_urls, fetched, elapsed)
+            timer.report()
+            if leased.describe_blocking():
+                print(f"🧱 {leased.describe_blocking()}")
+            if fast_path_enabled():
+                print(f"⚡ {FAST_PATH_STATS.describe()}")
 
             print("\n✅ Final Scraped Data:")
             for idx, product in enumerate(products_data, start=1):
@@ -168,10 +115,121 @@ async def scrape_amazon(search_query, persist_browser=False):
     except Exception as e:
         print(f"❌ Error during scraping process: {e}")
 
+
+async def search_cards_in_browser(leased, search_query):
+    """Run the search in a browser tab and return the result cards on the first results page."""
+    page = await leased.new_page()
+
+    if leased.warmed_up:
+        # ✅ Valid stored session: go straight to the results page
+        print(f"Searching for: {search_query} (reusing stored session)")
+        await pace()
+        await page.goto(build_search_url(search_query), wait_until="domcontentloaded")
+        await leased.handle_captcha(page)
+    else:
+        # Navigate to Amazon homepage and handle CAPTCHA
+        print("Navigating to Amazon homepage...")
+        await leased.warm_up(page)
+
+        # Perform the search
+        print(f"Searching for: {search_query}")
+        search_bar_selector = 'input#twotabsearchtextbox'
+        await pace()
+        await page.fill(search_bar_selector, search_query)
+        await page.press(search_bar_selector, "Enter")
+
+    # Wait for results
+    print("Waiting for search results...")
+    await page.wait_for_selector('div.s-main-slot', timeout=180000)
+    record_removed_sleep(10)  # Was a fixed 10 s sleep before this wait
+
+    # Extract every card in one round trip
+    cards = []
+    for raw_card in await page.evaluate(SEARCH_CARDS_JS, [SEARCH_CARD_SELECTOR, SEARCH_CARD_LINK_SELECTOR]):
+        try:
+            cards.append(parse_search_card(raw_card))
+        except Exception as e:
+            print(f"⚠️ Error extracting search card: {e}")
+    print(f"Found {len(cards)} products.")
+    await page.close()
+    return cards
+
+
+async def collect_search_cards(leased, search_query):
+    """Search result cards for a query: HTTP fast path first, browser as fallback."""
+    if fast_path_enabled():
+        try:
+            cards = await fetch_search_results(search_query)
+            print(f"⚡ Search results fetched over HTTP ({len(cards)} products).")
+            return cards
+        except FastPathMiss as e:
+            print(f"↩️ HTTP search missed ({e.reason}) — using the browser.")
+    return await search_cards_in_browser(leased, search_query)
+
+
+async def extract_product_page(leased, idx, total, product_url):
+    """
+    Extract one product page: over HTTP when the fast path works, otherwise in its own browser tab.
+    Returns (product_data or None, seconds taken, error or None).
+    """
+    print(f"\nNavigating to product page {idx + 1}/{total}: {product_url}")
+    started = time.perf_counter()
+    if fast_path_enabled():
+        try:
+            return await fetch_product_page(product_url), time.perf_counter() - started, None
+        except FastPathMiss as e:
+            print(f"↩️ HTTP fetch missed for product {idx + 1} ({e.reason}) — using the browser.")
+
+    product_page = await leased.new_page()
+    try:
+        await pace()
+        await product_page.goto(product_url, timeout=60000, wait_until="domcontentloaded")
+        # ✅ Read the page as soon as the title is in the DOM instead of waiting for every asset
+        try:
+            await product_page.wait_for_selector("span#productTitle", timeout=15000)
+        except PlaywrightTimeoutError:
+            pass
+
+        # ✅ One round trip for the whole document; parsing happens offline in html_parser
+        html = await product_page.content()
+        archive_html(html, product_url)
+        product_data = await asyncio.to_thread(cached_parse, "product", html, product_url)
+        return product_data, time.perf_counter() - started, None
+
+    except Exception as e:
+        print(f"⚠️ Error extracting product {idx + 1}: {e}")
+        return None, time.perf_counter() - started, e
     finally:
-        if browser:
-            print("Closing the browser...")
-            await browser.close()
+        await product_page.close()
+
+
+def archive_html(html, product_url):
+    """Save a fetched product page to SCRAPER_HTML_ARCHIVE_DIR (if set) so it can be re-parsed later."""
+    archive_dir = scraper_setting("SCRAPER_HTML_ARCHIVE_DIR", None)
+    if not archive_dir:
+        return
+    try:
+        os.makedirs(archive_dir, exist_ok=True)
+        name = hashlib.sha1(product_url.encode("utf-8")).hexdigest()[:16]
+        with open(os.path.join(archive_dir, f"product-{name}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+    except OSError as e:
+        print(f"⚠️ Could not archive page HTML: {e}")
+
+
+def print_detail_report(product_urls, fetched, elapsed):
+    """Print per-page timing and failures for a batch of product page fetches."""
+    failures = 0
+    print("\n⏱️ Product page timings:")
+    for idx, (product_url, (product_data, seconds, error)) in enumerate(zip(product_urls, fetched), start=1):
+        status = "ok" if product_data else f"FAILED ({error})"
+        failures += 0 if product_data else 1
+        print(f"  {idx:>2}. {seconds:6.2f}s — {status} — {product_url}")
+    serial_time = sum(seconds for _, seconds, _ in fetched)
+    print(
+        f"  Total: {elapsed:.2f}s wall-clock for {serial_time:.2f}s of page work "
+        f"— {len(fetched) - failures} ok, {failures} failed"
+    )
 
 
 # ✅ If executed as a script
@@ -0,0 +1,106 @@
+# resource_blocking.py
+
+from collections import Counter
+from scraper.config import scraper_setting
+
+# The scrapers only read text from the DOM, so heavy assets can be dropped.
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+# Ads, tracking beacons and metrics endpoints seen on Amazon pages
+DEFAULT_BLOCKED_URL_PATTERNS = (
+    "amazon-adsystem.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "fls-na.amazon.com",
+    "unagi.amazon.com",
+    "unagi-na.amazon.com",
+    "/uedata",
+    "/gp/ad/",
+    "/1/batch/",
+    "/rd/uedata",
+)
+
+# Never blocked: CAPTCHA images have to load so they can be screenshotted and solved
+ALWAYS_ALLOWED_URL_PATTERNS = ("/captcha/",)
+
+# Rough average transfer sizes, used to estimate bytes saved (blocked requests are never downloaded)
+ESTIMATED_BYTES_PER_TYPE = {
+    "image": 35_000,
+    "media": 400_000,
+    "font": 40_000,
+    "script": 25_000,
+    "stylesheet": 15_000,
+}
+ESTIMATED_BYTES_OTHER = 2_000
+
+
+class BlockingStats:
+    """Blocked/allowed request counters of one browser context, reset at the start of each lease."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.blocked = Counter()
+        self.allowed_requests = 0
+        self.estimated_bytes_saved = 0
+
+    def stats(self):
+        return {
+            "blocked_requests": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "allowed_requests": self.allowed_requests,
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+        }
+
+    def describe(self):
+        stats = self.stats()
+        return (
+            f"Blocked {stats['blocked_requests']} requests "
+            f"(~{stats['estimated_bytes_saved'] / 1_000_000:.1f} MB saved, estimated from typical sizes), "
+            f"allowed {stats['allowed_requests']} — {stats['blocked_by_type']}"
+        )
+
+
+class ResourceBlocker:
+    """
+    Route handler that aborts requests for blocked resource types and URL patterns.
+    Each context it is attached to gets its own BlockingStats.
+    """
+
+    def __init__(self, resource_types=DEFAULT_BLOCKED_RESOURCE_TYPES, url_patterns=DEFAULT_BLOCKED_URL_PATTERNS):
+        self.resource_types = frozenset(resource_types)
+        self.url_patterns = tuple(url_patterns)
+
+    def should_block(self, resource_type, url):
+        if any(pattern in url for pattern in ALWAYS_ALLOWED_URL_PATTERNS):
+            return False
+        if resource_type in self.resource_types:
+            return True
+        return any(pattern in url for pattern in self.url_patterns)
+
+    async def handle(self, route, stats):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            stats.blocked[request.resource_type] += 1
+            stats.estimated_bytes_saved += ESTIMATED_BYTES_PER_TYPE.get(request.resource_type, ESTIMATED_BYTES_OTHER)
+            await route.abort("blockedbyclient")
+        else:
+            stats.allowed_requests += 1
+            await route.continue_()
+
+    async def attach(self, context):
+        """Install the blocker on a browser context (all its pages) and return that context's BlockingStats."""
+        stats = BlockingStats()
+        await context.route("**/*", lambda route: self.handle(route, stats))
+        return stats
+
+
+def build_resource_blocker():
+    """Create the blocker from settings, or None when blocking is disabled."""
+    if not scraper_setting("SCRAPER_BLOCK_RESOURCES", True):
+        return None
+    return ResourceBlocker(
+        resource_types=scraper_setting("SCRAPER_BLOCKED_RESOURCE_TYPES", DEFAULT_BLOCKED_RESOURCE_TYPES),
+        url_patterns=scraper_setting("SCRAPER_BLOCKED_URL_PATTERNS", DEFAULT_BLOCKED_URL_PATTERNS),
+    )
@@ -0,0 +1,103 @@
+# result_store.py
+
+import time
+import threading
+from collections import OrderedDict
+from scraper.config import scraper_setting
+
+# Where manual search results wait for the user to pick a product.
+# Entries expire after a TTL and the store is capped in size. The "cache" backend goes through a Django cache (file-based by default),
+# so every worker process sees the same results.
+
+DEFAULT_TTL_MINUTES = 30
+DEFAULT_MAX_ENTRIES = 500
+
+
+class InMemoryResultStore:
+    """Per-process store: an OrderedDict with TTL expiry, evicting the oldest-written entries when full."""
+
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now):
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._entries.get(user_id)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return entry
+
+    def set(self, user_id, entry):
+        now = time.monotonic()
+        with self._lock:
+            # Re-inserting moves the key to the end, so the dict stays ordered by expiry
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (now + self.ttl_seconds, entry)
+            self._evict_expired(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            return len(self._entries)
+
+
+class CacheResultStore:
+    """Cross-process store backed by a Django cache alias (TTL = cache timeout, size cap = MAX_ENTRIES)."""
+
+    KEY_PREFIX = "scrape-results"
+
+    def __init__(self, ttl_seconds, alias="scrape_results"):
+        from django.core.cache import caches
+        self.ttl_seconds = ttl_seconds
+        self.cache = caches[alias]
+
+    def _key(self, user_id):
+        return f"{self.KEY_PREFIX}:{user_id}"
+
+    def get(self, user_id):
+        return self.cache.get(self._key(user_id))
+
+    def set(self, user_id, entry):
+        self.cache.set(self._key(user_id), entry, timeout=self.ttl_seconds)
+
+    def delete(self, user_id):
+        self.cache.delete(self._key(user_id))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Return the process-wide result store, configured from SCRAPER_RESULT_* settings."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = scraper_setting("SCRAPER_RESULT_STORE", "memory")
+            ttl_seconds = scraper_setting("SCRAPER_RESULT_TTL_MINUTES", DEFAULT_TTL_MINUTES) * 60
+            if backend == "cache":
+                _store = CacheResultStore(ttl_seconds, scraper_setting("SCRAPER_RESULT_CACHE_ALIAS", "scrape_results"))
+            elif backend == "memory":
+                _store = InMemoryResultStore(ttl_seconds, scraper_setting("SCRAPER_RESULT_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+            else:
+                raise ValueError(f"Unknown result store backend '{backend}'.")
+    return _store
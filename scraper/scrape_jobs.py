@@ -0,0 +1,257 @@
+# scrape_jobs.py
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+import os
+import socket
+import threading
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+from base.models import ScrapeJob, TrackedProduct
+from scraper.config import scraper_setting
+from scraper.playwright_scraper import scrape_amazon
+from scheduled_tasks.actions import run_scraping
+
+# Scrapes run as ScrapeJob rows instead of inside the request thread. /search/ (and, in
+# queue mode, the scheduler and manual refreshes) create a job and return its ID right away.
+#
+# SCRAPER_JOB_BACKEND:
+#   - "thread": jobs run on a small thread executor inside the web process (no extra services)
+#   - "queue":  jobs stay queued in the database and `python manage.py scrape_worker` processes
+#               claim them. Run as many workers as needed, on one host or several.
+#
+# Claiming is a conditional UPDATE (status still "queued"), so it is atomic on every database,
+# SQLite included. A running job's heartbeat_at is refreshed every SCRAPER_JOB_HEARTBEAT_SECONDS;
+# jobs whose worker stopped reporting for SCRAPER_JOB_STALE_SECONDS are queued again
+# (or failed after SCRAPER_JOB_MAX_ATTEMPTS claims).
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def job_backend():
+    return scraper_setting("SCRAPER_JOB_BACKEND", "thread")
+
+
+def default_worker_id(suffix=None):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{worker_id}:{suffix}" if suffix else worker_id
+
+
+def get_job_executor():
+    """Return the in-process job executor (created on first use)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, scraper_setting("SCRAPER_JOB_WORKERS", 2)),
+                thread_name_prefix="scrape-job",
+            )
+    return _executor
+
+
+# -------------------------------
+# Enqueueing
+# -------------------------------
+
+def enqueue_refresh_job(products, event_name=None, user=None):
+    """Create a job that re-checks the prices of the given tracked products."""
+    titles = ", ".join(product.title for product in products)
+    job = ScrapeJob.objects.create(
+        kind=ScrapeJob.KIND_REFRESH,
+        user=user,
+        query=titles[:255],
+        payload={"product_ids": [product.id for product in products], "event_name": event_name},
+    )
+    submit_scrape_job(job)
+    return job
+
+
+def submit_scrape_job(job):
+    """Hand a queued job to the in-process executor, or leave it for the worker fleet in queue mode."""
+    if job_backend() == "queue":
+        print(f"📥 Job {job.id} queued for the scrape workers.")
+        return
+    get_job_executor().submit(run_scrape_job, job.id)
+
+
+# -------------------------------
+# Claiming, Heartbeats & Reclaiming
+# -------------------------------
+
+def claim_job(job_id, worker_id):
+    """Atomically take a queued job; False if another worker got it first."""
+    now = timezone.now()
+    return ScrapeJob.objects.filter(id=job_id, status=ScrapeJob.STATUS_QUEUED).update(
+        status=ScrapeJob.STATUS_RUNNING,
+        claimed_by=worker_id,
+        heartbeat_at=now,
+        started_at=now,
+        attempts=F("attempts") + 1,
+    ) == 1
+
+
+def claim_next_job(worker_id, candidates=5):
+    """Claim the oldest queued job, or return None if the queue is empty."""
+    queued = ScrapeJob.objects.filter(status=ScrapeJob.STATUS_QUEUED).order_by("created_at", "id")
+    for job_id in queued.values_list("id", flat=True)[:candidates]:
+        if claim_job(job_id, worker_id):
+            return job_id
+    return None
+
+
+def reclaim_stale_jobs(stale_seconds=None, max_attempts=None):
+    """Re-queue running jobs whose worker stopped heartbeating (fail them once out of attempts)."""
+    stale_seconds = stale_seconds or scraper_setting("SCRAPER_JOB_STALE_SECONDS", 120)
+    max_attempts = max_attempts or scraper_setting("SCRAPER_JOB_MAX_ATTEMPTS", 3)
+    stale = ScrapeJob.objects.filter(
+        status=ScrapeJob.STATUS_RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(seconds=stale_seconds),
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=ScrapeJob.STATUS_FAILED,
+        error=f"Worker stopped responding ({max_attempts} attempts).",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=ScrapeJob.STATUS_QUEUED, claimed_by=None)
+    if failed or requeued:
+        print(f"♻️ Reclaimed stale jobs: {requeued} re-queued, {failed} failed.")
+    return requeued, failed
+
+
+def resume_orphaned_jobs():
+    """
+    Thread backend: no worker fleet picks up queued jobs, so jobs left queued or running by a
+    restarted web process would never finish. Reclaims stale jobs and runs every job that has
+    been queued for longer than SCRAPER_JOB_STALE_SECONDS in this process (claiming makes a
+    duplicate submission harmless). Called at scheduler start and on an interval.
+    """
+    close_old_connections()
+    try:
+        reclaim_stale_jobs()
+        cutoff = timezone.now() - timedelta(seconds=scraper_setting("SCRAPER_JOB_STALE_SECONDS", 120))
+        orphaned = list(
+            ScrapeJob.objects.filter(status=ScrapeJob.STATUS_QUEUED, created_at__lt=cutoff)
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+        )
+        for job_id in orphaned:
+            get_job_executor().submit(run_scrape_job, job_id)
+        if orphaned:
+            print(f"♻️ Resumed {len(orphaned)} orphaned scrape job(s).")
+    except Exception as e:
+        print(f"❌ Error resuming orphaned scrape jobs: {e}")
+    finally:
+        close_old_connections()
+
+
+class Heartbeat:
+    """Background thread that keeps a claimed job's heartbeat_at fresh while it runs."""
+
+    def __init__(self, job_id, worker_id, interval=None):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval or scraper_setting("SCRAPER_JOB_HEARTBEAT_SECONDS", 15)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"scrape-job-{job_id}-heartbeat", daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                # A failed beat (e.g. "database is locked" on SQLite) is retried on the next one
+                try:
+                    ScrapeJob.objects.filter(
+                        id=self.job_id, claimed_by=self.worker_id, status=ScrapeJob.STATUS_RUNNING
+                    ).update(heartbeat_at=timezone.now())
+                except Exception as e:
+                    print(f"⚠️ Heartbeat for job {self.job_id} failed, retrying: {e}")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+# -------------------------------
+# Running Jobs
+# -------------------------------
+
+def run_scrape_job(job_id, worker_id=None):
+    """Claim and run one job (used by the in-process executor)."""
+    close_old_connections()
+    try:
+        worker_id = worker_id or default_worker_id(threading.current_thread().name)
+        if not claim_job(job_id, worker_id):
+            print(f"ℹ️ Job {job_id} was already claimed elsewhere.")
+            return
+        run_claimed_job(job_id, worker_id)
+    finally:
+        close_old_connections()
+
+
+def run_claimed_job(job_id, worker_id):
+    """Run a job this worker has claimed, recording progress, results or the error on the row."""
+    mine = ScrapeJob.objects.filter(id=job_id, claimed_by=worker_id)
+    try:
+        job = ScrapeJob.objects.select_related("user").get(id=job_id)
+        print(f"🛠️ Worker {worker_id} running job {job_id} ({job.kind}: '{job.query}', attempt {job.attempts}).")
+        with Heartbeat(job_id, worker_id):
+            results = JOB_HANDLERS[job.kind](job)
+
+        mine.update(
+            status=ScrapeJob.STATUS_DONE,
+            results=results,
+            finished_at=timezone.now(),
+        )
+        print(f"✅ Job {job_id} done.")
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {e}")
+        mine.update(
+            status=ScrapeJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+
+
+def run_search_job(job):
+    """Manual search: scrape the query for its user and return the products."""
+    # Awaited on the pool loop as pages complete, so the ORM call goes through sync_to_async
+    async def progress(**fields):
+        await sync_to_async(ScrapeJob.objects.filter(id=job.id).update)(**fields)
+
+    ScrapeJob.objects.filter(id=job.id).update(pages_done=0, products_found=0)
+    results = async_to_sync(scrape_amazon)(
+        job.query, job.user_id, job.depth, availability_mode=job.availability_mode, progress=progress
+    )
+    if results is None:
+        raise RuntimeError("Search failed before any results page loaded.")
+    ScrapeJob.objects.filter(id=job.id).update(products_found=len(results))
+    return [job_result_record(product) for product in results]
+
+
+def job_result_record(product):
+    """A product as stored on the job: Decimal prices become floats, as the result store's responses render them."""
+    return {key: float(value) if isinstance(value, Decimal) else value for key, value in product.items()}
+
+
+def run_refresh_job(job):
+    """Price re-check: run the scheduled-scraping engine for the job's tracked products."""
+    payload = job.payload or {}
+    products = list(TrackedProduct.objects.filter(id__in=payload.get("product_ids", [])).select_related("user"))
+    async_to_sync(run_scraping)(filtered_products=products, event_name=payload.get("event_name"))
+    ScrapeJob.objects.filter(id=job.id).update(products_found=len(products))
+    return {"product_ids": [product.id for product in products]}
+
+
+JOB_HANDLERS = {
+    ScrapeJob.KIND_SEARCH: run_search_job,
+    ScrapeJob.KIND_REFRESH: run_refresh_job,
+}
@@ -0,0 +1,77 @@
+# search_cache.py
+
+from datetime import timedelta
+from base.models import SearchResult, current_time_gmt2
+from scraper.amazon_urls import normalize_query
+from scraper.config import scraper_setting
+
+# Every completed search is written to SearchResult (one row per product, one shared
+# created_at per search), and /search/ answers from the latest search for the same
+# normalized query and depth while it is younger than SCRAPER_SEARCH_CACHE_MINUTES.
+
+
+def save_search_results(search_query, depth, products):
+    """Bulk-insert one search's products into SearchResult (skipping cards without a link)."""
+    created_at = current_time_gmt2()
+    rows = [
+        SearchResult(
+            query=search_query[:255],
+            normalized_query=normalize_query(search_query)[:255],
+            depth=depth,
+            position=position,
+            asin=product.get("asin"),
+            product_name=(product.get("title") or "No title found")[:255],
+            product_url=product["link"],
+            price=product.get("price"),
+            rating=product.get("rating"),
+            reviews=product.get("reviews"),
+            availability=product.get("availability"),
+            created_at=created_at,
+        )
+        for position, product in enumerate(products)
+        if product.get("link")
+    ]
+    SearchResult.objects.bulk_create(rows, batch_size=200)
+    return len(rows)
+
+
+def load_cached_search(search_query, depth, max_age_minutes=None):
+    """
+    Products of the newest stored search for this query and depth, in their original order,
+    or (None, None) if there is none younger than `max_age_minutes`. Returns (products, created_at).
+    """
+    if max_age_minutes is None:
+        max_age_minutes = scraper_setting("SCRAPER_SEARCH_CACHE_MINUTES", 60)
+    if max_age_minutes <= 0:
+        return None, None
+
+    latest = (
+        SearchResult.objects
+        .filter(
+            normalized_query=normalize_query(search_query),
+            depth=depth,
+            created_at__gte=current_time_gmt2() - timedelta(minutes=max_age_minutes),
+        )
+        .order_by('-created_at')
+        .values_list('created_at', flat=True)
+        .first()
+    )
+    if latest is None:
+        return None, None
+
+    rows = SearchResult.objects.filter(
+        normalized_query=normalize_query(search_query), depth=depth, created_at=latest
+    ).order_by('position')
+    products = [
+        {
+            "asin": row.asin,
+            "title": row.product_name,
+            "price": row.price,
+            "rating": float(row.rating) if row.rating is not None else None,
+            "reviews": row.reviews,
+            "link": row.product_url,
+            "availability": row.availability or "Unknown",
+        }
+        for row in rows
+    ]
+    return products, latest
@@ -0,0 +1,69 @@
+# session_state.py
+
+import os
+import json
+import time
+import tempfile
+from scraper.config import scraper_setting
+
+# A Playwright storage_state (cookies + localStorage) saved after a clean homepage
+# visit or CAPTCHA solve. Shared through a file so every process and every run can
+# reuse it until it expires.
+
+
+def session_state_path():
+    return scraper_setting(
+        "SCRAPER_SESSION_STATE_PATH",
+        os.path.join(tempfile.gettempdir(), "amazon_scraper_session.json"),
+    )
+
+
+def session_ttl_seconds():
+    return scraper_setting("SCRAPER_SESSION_TTL_MINUTES", 360) * 60
+
+
+def load_session_state():
+    """
+    Return (storage_state, age in seconds) for the stored session,
+    or (None, None) if there is none or it has expired.
+    """
+    path = session_state_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable session state '{path}': {e}")
+        return None, None
+
+    age = time.time() - saved.get("saved_at", 0)
+    if age > session_ttl_seconds():
+        print(f"⌛ Stored Amazon session expired ({age / 60:.0f} min old).")
+        return None, None
+    return saved.get("storage_state"), age
+
+
+def save_session_state(storage_state):
+    """Persist a storage_state atomically (write to a temp file, then rename)."""
+    path = session_state_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"saved_at": time.time(), "storage_state": storage_state}, f)
+        os.replace(temp_path, path)
+        print("💾 Amazon session state saved for reuse.")
+    except OSError as e:
+        print(f"⚠️ Could not save session state: {e}")
+
+
+def invalidate_session_state():
+    """Drop the stored session (e.g. after Amazon rejected it)."""
+    try:
+        os.remove(session_state_path())
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ Could not remove session state: {e}")
@@ -0,0 +1,115 @@
+# single_flight.py
+
+import copy
+import time
+import asyncio
+from collections import Counter, OrderedDict
+from scraper.config import scraper_setting
+
+# Identical searches that arrive while one is already running share that scrape instead of
+# opening their own tabs, and repeats within a short TTL are answered from the last result.
+# Everything here runs on the browser pool's event loop, so no locking is needed.
+
+
+class _Flight:
+    """One in-flight call: the shared task plus the progress callbacks of everyone waiting on it."""
+
+    def __init__(self):
+        self.task = None
+        self.listeners = []
+
+    async def progress(self, **fields):
+        for listener in list(self.listeners):
+            try:
+                await listener(**fields)
+            except Exception as e:
+                print(f"⚠️ Progress callback failed: {e}")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one, and cache successful results for
+    `ttl_seconds` (at most `max_entries` keys). Every caller gets its own deep copy.
+    """
+
+    def __init__(self, ttl_seconds=120, max_entries=100):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._in_flight = {}
+        self._recent = OrderedDict()
+        self.stats = Counter()
+
+    def _cached(self, key):
+        item = self._recent.get(key)
+        if item is None:
+            return None
+        expires_at, result = item
+        if expires_at <= time.monotonic():
+            del self._recent[key]
+            return None
+        return result
+
+    def _remember(self, key, result):
+        if self.ttl_seconds <= 0 or result is None:
+            return
+        self._recent.pop(key, None)
+        self._recent[key] = (time.monotonic() + self.ttl_seconds, result)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    async def run(self, key, factory, progress=None):
+        """
+        Return factory(progress)'s result for `key`, joining an identical call already in flight.
+        `factory` is called with a progress callback that reaches every caller's `progress`.
+        """
+        cached = self._cached(key)
+        if cached is not None:
+            self.stats["cached"] += 1
+            print(f"♻️ Reusing results from a search that finished under {self.ttl_seconds}s ago: {key}")
+            return copy.deepcopy(cached)
+
+        flight = self._in_flight.get(key)
+        if flight is None:
+            self.stats["started"] += 1
+            flight = self._in_flight[key] = _Flight()
+
+            def finished(task):
+                self._in_flight.pop(key, None)
+                if not task.cancelled() and task.exception() is None:
+                    self._remember(key, task.result())
+
+            flight.task = asyncio.ensure_future(factory(flight.progress))
+            flight.task.add_done_callback(finished)
+        else:
+            self.stats["joined"] += 1
+            print(f"🔗 Joining an identical search already in progress: {key}")
+
+        if progress:
+            flight.listeners.append(progress)
+        try:
+            # shield(): a caller that gives up must not cancel the scrape the others are waiting on
+            result = await asyncio.shield(flight.task)
+        finally:
+            if progress:
+                flight.listeners.remove(progress)
+        return copy.deepcopy(result)
+
+    def describe(self):
+        return (
+            f"Search coalescing: {self.stats['started']} scrape(s) run, {self.stats['joined']} joined in flight, "
+            f"{self.stats['cached']} served from the last {self.ttl_seconds}s"
+        )
+
+
+_search_flights = None
+
+
+def get_search_flights():
+    """Return the process-wide SingleFlight for search scrapes (SCRAPER_COALESCE_* settings)."""
+    global _search_flights
+    if _search_flights is None:
+        _search_flights = SingleFlight(
+            ttl_seconds=scraper_setting("SCRAPER_COALESCE_TTL_SECONDS", 120),
+            max_entries=scraper_setting("SCRAPER_COALESCE_MAX_ENTRIES", 100),
+        )
+    return _search_flights
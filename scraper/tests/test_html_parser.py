@@ -0,0 +1,132 @@
+import re
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from bs4 import BeautifulSoup
+from django.test import SimpleTestCase
+from scraper.html_parser import (
+    HTML_PARSER,
+    PARSERS,
+    SEARCH_CARD_SELECTOR,
+    SEARCH_CARDS_JS,
+    build_product_record,
+    cached_parse,
+    parse_product_page,
+    parse_search_card,
+    parse_search_results,
+    read_search_card,
+)
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def load_fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def search_cards_js_fields():
+    """The keys of the object SEARCH_CARDS_JS returns for each card."""
+    body = SEARCH_CARDS_JS.split("return {", 1)[1].split("};", 1)[0]
+    return set(re.findall(r"^\s*(\w+):", body, re.MULTILINE))
+
+
+class SearchResultsParserTests(SimpleTestCase):
+    def setUp(self):
+        self.html = load_fixture("search_results.html")
+
+    def test_raw_card_fields_match_search_cards_js(self):
+        soup = BeautifulSoup(self.html, HTML_PARSER)
+        cards = soup.select(SEARCH_CARD_SELECTOR)
+        self.assertEqual(len(cards), 3)
+        for card in cards:
+            self.assertEqual(set(read_search_card(card)), search_cards_js_fields())
+
+    def test_card_records_have_the_live_scraper_fields(self):
+        # Same raw fields as the browser returns, so the same records as extract_cards
+        raw_card = {field: None for field in search_cards_js_fields()}
+        raw_card.update(has_title=False, title_spans=[])
+        expected_fields = set(parse_search_card(raw_card))
+
+        cards = parse_search_results(self.html)
+        self.assertEqual(len(cards), 3)
+        for card in cards:
+            self.assertEqual(set(card), expected_fields)
+
+    def test_parses_a_regular_card(self):
+        card = parse_search_results(self.html)[0]
+        self.assertEqual(card, {
+            "asin": "B0TEST0001",
+            "title": "Anker USB C Cable, 6 ft Braided Fast Charging Cable",
+            "price": Decimal("12.99"),
+            "rating": 4.7,
+            "reviews": 48213,
+            "link": "https://www.amazon.com/Anker-USB-C-Cable-Braided/dp/B0TEST0001/ref=sr_1_1?keywords=usb+c+cable",
+        })
+
+    def test_sponsored_card_takes_the_title_link_not_the_review_link(self):
+        card = parse_search_results(self.html)[1]
+        self.assertEqual(card["asin"], "B0TEST0002")
+        self.assertEqual(card["title"], "Cable Matters Thunderbolt 4 Cable 3.3 ft")
+        self.assertEqual(card["price"], Decimal("1299.00"))
+        self.assertEqual(card["reviews"], 1024)
+        self.assertIn("sr_1_2_sspa", card["link"])
+        self.assertNotIn("customerReviews", card["link"])
+
+    def test_card_without_offer_or_asin(self):
+        card = parse_search_results(self.html)[2]
+        self.assertIsNone(card["asin"])
+        self.assertEqual(card["title"], "Generic USB C to USB A Adapter")
+        self.assertIsNone(card["price"])
+        self.assertIsNone(card["rating"])
+        self.assertIsNone(card["reviews"])
+        self.assertEqual(card["link"], "https://www.amazon.com/Generic-USB-C-Adapter/dp/B0TEST0003/ref=sr_1_3")
+
+
+class ProductPageParserTests(SimpleTestCase):
+    URL = "https://www.amazon.com/dp/B0TEST0001"
+
+    def test_parses_the_product_page(self):
+        record = parse_product_page(load_fixture("product_page.html"), self.URL)
+        self.assertEqual(record, {
+            "title": "Anker USB C Cable, 6 ft Braided Fast Charging Cable",
+            "price": "$12.99",
+            "price_numeric": 12.99,
+            "rating": "4.7 out of 5 stars",
+            "reviews": "48,213 ratings",
+            "availability": "In Stock",
+            "url": self.URL,
+        })
+
+    def test_record_fields_match_build_product_record(self):
+        missing = build_product_record(
+            {"title": None, "price": None, "rating": None, "reviews": None, "availability": None}, self.URL
+        )
+        record = parse_product_page(load_fixture("product_page.html"), self.URL)
+        self.assertEqual(set(record), set(missing))
+
+    def test_missing_fields_fall_back_to_placeholders(self):
+        record = parse_product_page(load_fixture("captcha.html"), self.URL)
+        self.assertEqual(record["title"], "No title found")
+        self.assertEqual(record["price"], "Price not available")
+        self.assertIsNone(record["price_numeric"])
+        self.assertEqual(record["availability"], "Availability not found")
+
+
+class CachedParseTests(SimpleTestCase):
+    URL = "https://www.amazon.com/dp/B0TEST0001"
+
+    def test_identical_pages_are_parsed_once(self):
+        html = load_fixture("product_page.html") + "<!-- cached_parse -->"
+        parser = mock.Mock(wraps=parse_product_page)
+        with mock.patch.dict(PARSERS, {"product": parser}):
+            first = cached_parse("product", html, self.URL)
+            second = cached_parse("product", html, self.URL)
+            other_url = cached_parse("product", html, self.URL + "?th=1")
+        self.assertEqual(parser.call_count, 2)
+        self.assertEqual(first, second)
+        self.assertEqual(other_url["url"], self.URL + "?th=1")
+
+    def test_returns_copies_callers_may_modify(self):
+        html = load_fixture("search_results.html")
+        cached_parse("search", html)[0]["title"] = "changed"
+        self.assertEqual(cached_parse("search", html)[0]["title"], "Anker USB C Cable, 6 ft Braided Fast Charging Cable")
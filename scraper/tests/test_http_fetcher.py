@@ -0,0 +1,129 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from django.test import override_settings
+from scraper import http_fetcher, refinement_scraper
+from scraper.amazon_urls import build_product_url
+from scraper.tests.test_html_parser import load_fixture
+
+# A local stand-in for Amazon serving the saved fixture pages (SCRAPER_HTTP_BASE_URL points at it)
+SEARCH_PAGES = {"usb c cable": "search_results.html", "captcha": "captcha.html"}
+PRODUCT_PAGES = {"B0TEST0001": "product_page.html", "B0CAPTCHA1": "captcha.html"}
+
+
+class SavedPagesHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/s":
+            name = SEARCH_PAGES.get(parse_qs(url.query).get("k", [""])[0])
+        elif url.path.startswith("/dp/"):
+            name = PRODUCT_PAGES.get(url.path[len("/dp/"):])
+        else:
+            name = None
+
+        if name is None:
+            self.send_response(404)
+            body = b"<html><body>Page not found</body></html>"
+        else:
+            self.send_response(200)
+            body = load_fixture(name).encode("utf-8")
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpFastPathTests(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SavedPagesHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        host, port = self.server.server_address
+        settings = override_settings(
+            SCRAPER_HTTP_FAST_PATH=True,
+            SCRAPER_HTTP_BASE_URL=f"http://{host}:{port}",
+            SCRAPER_SESSION_STATE_PATH="/nonexistent/scraper_session.json",
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.stats = http_fetcher.FastPathStats()
+        stats_patch = mock.patch.object(http_fetcher, "FAST_PATH_STATS", self.stats)
+        stats_patch.start()
+        self.addCleanup(stats_patch.stop)
+
+    async def asyncTearDown(self):
+        # The shared client belongs to this test's event loop
+        await http_fetcher.close_http_client()
+
+    async def test_search_hit(self):
+        cards = await http_fetcher.fetch_search_results("usb c cable")
+        self.assertEqual([card["asin"] for card in cards], ["B0TEST0001", "B0TEST0002", None])
+        self.assertEqual(self.stats.hits, 1)
+        self.assertFalse(self.stats.fallbacks)
+
+    async def test_product_hit(self):
+        url = build_product_url("B0TEST0001")
+        product = await http_fetcher.fetch_product_page(url)
+        self.assertEqual(product["title"], "Anker USB C Cable, 6 ft Braided Fast Charging Cable")
+        self.assertEqual(product["price_numeric"], 12.99)
+        self.assertEqual(product["url"], url)
+        self.assertEqual(self.stats.hits, 1)
+
+    async def test_captcha_page_is_a_miss(self):
+        with self.assertRaises(http_fetcher.FastPathMiss) as caught:
+            await http_fetcher.fetch_product_page(build_product_url("B0CAPTCHA1"))
+        self.assertEqual(caught.exception.reason, "captcha")
+        self.assertEqual(self.stats.hits, 0)
+        self.assertEqual(self.stats.fallbacks["captcha"], 1)
+
+    async def test_non_200_response_is_a_miss(self):
+        with self.assertRaises(http_fetcher.FastPathMiss) as caught:
+            await http_fetcher.fetch_product_page(build_product_url("B0MISSING1"))
+        self.assertEqual(caught.exception.reason, "status 404")
+        self.assertEqual(self.stats.fallbacks["status 404"], 1)
+
+    async def test_search_uses_http_cards_on_a_hit(self):
+        with mock.patch.object(refinement_scraper, "search_cards_in_browser", new=mock.AsyncMock()) as in_browser:
+            cards = await refinement_scraper.collect_search_cards(mock.Mock(), "usb c cable")
+        self.assertEqual(len(cards), 3)
+        in_browser.assert_not_awaited()
+
+    async def test_search_falls_back_to_the_browser_on_captcha(self):
+        leased = mock.Mock()
+        browser_cards = [{"asin": "B0TEST0001"}]
+        with mock.patch.object(
+            refinement_scraper, "search_cards_in_browser", new=mock.AsyncMock(return_value=browser_cards)
+        ) as in_browser:
+            cards = await refinement_scraper.collect_search_cards(leased, "captcha")
+        self.assertIs(cards, browser_cards)
+        in_browser.assert_awaited_once_with(leased, "captcha")
+        self.assertEqual(self.stats.fallbacks["captcha"], 1)
+
+    async def test_product_falls_back_to_the_browser_on_non_200(self):
+        url = build_product_url("B0MISSING1")
+        page = mock.AsyncMock()
+        page.content.return_value = load_fixture("product_page.html")
+        leased = mock.Mock(new_page=mock.AsyncMock(return_value=page))
+
+        with mock.patch.object(refinement_scraper, "pace", new=mock.AsyncMock()):
+            product, _, error = await refinement_scraper.extract_product_page(leased, 0, 1, url)
+
+        self.assertIsNone(error)
+        page.goto.assert_awaited_once()
+        self.assertEqual(product["title"], "Anker USB C Cable, 6 ft Braided Fast Charging Cable")
+        self.assertEqual(self.stats.fallbacks["status 404"], 1)